@@ -9,7 +9,9 @@ Modules:
     - slack_listener: Main Slack Socket Mode event listener
     - session_registry: Session management and Unix socket server
     - session_lifecycle: Session state machine and lifecycle management
-    - registry_db: SQLAlchemy ORM schema for session registry
+    - registry_db: SQLite schema and queries for session registry
+    - slack_text: Slack message splitting shared by the hooks
+    - inotify_watch: inotify helpers for event-driven waits (Linux)
     - claude_wrapper_hybrid: Hybrid architecture wrapper for Claude Code integration
     - claude_wrapper_multi: Multi-session wrapper variant for Phase 2.5
 
@@ -25,6 +27,8 @@ __all__ = [
     "session_registry",
     "session_lifecycle",
     "registry_db",
+    "slack_text",
+    "inotify_watch",
     "claude_wrapper_hybrid",
     "claude_wrapper_multi",
 ]
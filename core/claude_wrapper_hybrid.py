@@ -31,10 +31,12 @@ Environment Variables Set:
     CLAUDE_PROJECT_DIR   - Project directory path
 """
 
+import atexit
 import sys
 import os
 import pty
-import select
+import queue
+import selectors
 import termios
 import tty
 import socket
@@ -49,25 +51,82 @@ import logging.handlers
 import fcntl
 import struct
 import uuid
+from collections import deque
 from pathlib import Path
 from datetime import datetime
-from dotenv import load_dotenv
-from collections import deque
-
-# Load environment variables from .env file (in parent directory)
-env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
-load_dotenv(env_path)
 
 try:
-    from core.config import get_socket_dir, get_log_dir, get_claude_bin
+    from core.config import get_socket_dir, get_log_dir, get_claude_bin, get_registry_db_path, load_env_file, OUTPUT_BUFFER_DIR
+    from core.inotify_watch import IN_CREATE, IN_MODIFY, IN_MOVED_TO, open_inotify_watch, wait_for_inotify
 except ModuleNotFoundError:
-    from config import get_socket_dir, get_log_dir, get_claude_bin
+    from config import get_socket_dir, get_log_dir, get_claude_bin, get_registry_db_path, load_env_file, OUTPUT_BUFFER_DIR
+    from inotify_watch import IN_CREATE, IN_MODIFY, IN_MOVED_TO, open_inotify_watch, wait_for_inotify
+
+# Load environment variables from .env file (in parent directory)
+env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
+load_env_file(env_path)
 
 # Configuration
 SOCKET_DIR = os.environ.get("SLACK_SOCKET_DIR", get_socket_dir())
 REGISTRY_SOCKET = os.path.join(SOCKET_DIR, "registry.sock")
 DEBUG = os.environ.get("DEBUG_WRAPPER", "0") == "1"
 LOG_DIR = os.environ.get("SLACK_LOG_DIR", get_log_dir())
+# Socket buffer size for the input socket; Slack messages (even long
+# pastes) then arrive in a single recv
+SOCKET_BUFFER_SIZE = 65536
+# Seconds a Slack bot connection may sit idle before it is dropped (the
+# listener's own send timeout is 5s)
+SOCKET_IDLE_TIMEOUT = 5.0
+# Size of each of the two buffers Claude's PTY output is read into; together
+# they cover a full PTY kernel buffer, so a burst drains in one readv
+PTY_READ_SIZE = 32768
+# Bytes of recent PTY output kept for permission prompt capture
+OUTPUT_BUFFER_SIZE = 4096
+# The buffer file is append-only; once this many bytes have been appended it
+# is compacted back down to the last OUTPUT_BUFFER_SIZE bytes
+OUTPUT_BUFFER_FILE_MAX = 65536
+BUFFER_FILE_FLAGS = os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND
+# Pause between injected Slack text and its Enter key. Claude's input box
+# treats text and \r arriving in one read as a paste (the \r becomes a
+# newline instead of submitting), so this defaults to 100ms; set
+# CLAUDE_INPUT_DELAY_MS=0 to send both in a single write.
+try:
+    INPUT_ENTER_DELAY = max(0, int(os.environ.get("CLAUDE_INPUT_DELAY_MS", "100"))) / 1000
+except ValueError:
+    INPUT_ENTER_DELAY = 0.1
+
+# Registry messages are newline-delimited JSON. orjson encodes straight to
+# bytes and parses bytes without a decode step; fall back to the stdlib.
+# orjson.JSONDecodeError subclasses json.JSONDecodeError.
+try:
+    import orjson
+
+    def encode_message(message):
+        """Serialize a registry message as one newline-terminated line"""
+        return orjson.dumps(message) + b'\n'
+
+    decode_message = orjson.loads
+except ImportError:
+    def encode_message(message):
+        """Serialize a registry message as one newline-terminated line"""
+        return json.dumps(message).encode('utf-8') + b'\n'
+
+    decode_message = json.loads
+
+# How long a successful registry socket existence check is trusted (seconds)
+SOCKET_EXISTS_TTL = 0.5
+
+# Health check request, encoded once (sent repeatedly while the registry starts)
+LIST_PING = b'{"command":"LIST","data":{}}\n'
+
+# Claude names transcript directories after the project path with both / and _ turned into -
+PROJECT_DIR_ESCAPES = str.maketrans("/_", "--")
+
+# Idle registry connections, shared by every RegistryClient in the process:
+# socket path -> stack of (socket, leftover received bytes, idle since)
+REGISTRY_CONN_IDLE_TTL = 30.0  # Close pooled connections idle longer than this
+_registry_pool = {}
+_registry_pool_lock = threading.Lock()
 
 # ANSI color codes for terminal output
 CYAN = "\033[36m"
@@ -77,9 +136,21 @@ RED = "\033[31m"
 BOLD = "\033[1m"
 RESET = "\033[0m"
 
+# Alternate screen buffer sequences, written with a single write each
+ENTER_ALT_SCREEN = b"\x1b[?1049h\x1b[2J\x1b[H"  # Enter, clear, cursor home
+EXIT_ALT_SCREEN = b"\x1b[?1049l"
+
 # Setup logging
 def setup_logging(session_id):
-    """Setup comprehensive logging with rotation"""
+    """
+    Setup comprehensive logging with rotation.
+
+    Records are handed to a QueueListener thread that does the actual file
+    and stderr writes, so the I/O loop never waits on disk.
+
+    Returns:
+        (logger, listener) - the listener must be stopped to flush the queue
+    """
     # Create log directory
     os.makedirs(LOG_DIR, exist_ok=True)
 
@@ -106,11 +177,15 @@ def setup_logging(session_id):
     file_handler.setFormatter(formatter)
     console_handler.setFormatter(formatter)
 
-    # Add handlers
-    logger.addHandler(file_handler)
-    logger.addHandler(console_handler)
+    # Log calls only enqueue; the listener thread writes to the handlers
+    log_queue = queue.Queue(-1)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True
+    )
+    listener.start()
 
-    return logger
+    return logger, listener
 
 
 def debug_log(message):
@@ -147,6 +222,7 @@ class RegistryClient:
         self.logger = logger
         self.thread_ts = None
         self.channel = None
+        self._socket_seen_at = None  # monotonic time the socket was last seen
         self.available = self._check_availability()
 
     def _log(self, message, level="info"):
@@ -162,9 +238,26 @@ class RegistryClient:
                 self.logger.info(message)
         debug_log(message)
 
+    def _socket_exists(self):
+        """
+        Check whether the registry socket file exists.
+
+        A positive result is reused for SOCKET_EXISTS_TTL seconds, so the
+        back-to-back checks during a health check cost one stat. A missing
+        socket is never cached, and connection failures clear the cache.
+        """
+        now = time.monotonic()
+        if self._socket_seen_at is not None and now - self._socket_seen_at < SOCKET_EXISTS_TTL:
+            return True
+        if os.path.exists(self.registry_socket_path):
+            self._socket_seen_at = now
+            return True
+        self._socket_seen_at = None
+        return False
+
     def _check_availability(self):
         """Check if registry socket exists and is accessible"""
-        return os.path.exists(self.registry_socket_path)
+        return self._socket_exists()
 
     def _is_registry_responsive(self, timeout=2):
         """
@@ -173,56 +266,40 @@ class RegistryClient:
         Returns:
             True if registry responds within timeout, False otherwise
         """
-        if not os.path.exists(self.registry_socket_path):
-            return False
-
+        # No separate existence check: connect() fails with
+        # FileNotFoundError if the socket is missing
         try:
-            # Try to connect and send a simple LIST command
-            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            sock.settimeout(timeout)
-            sock.connect(self.registry_socket_path)
-
             # Send LIST command (lightweight health check)
-            message = {"command": "LIST", "data": {}}
-            sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
-
-            # Try to receive response
-            response_data = b''
-            start_time = time.time()
-            while time.time() - start_time < timeout:
-                chunk = sock.recv(4096)
-                if not chunk:
-                    break
-                response_data += chunk
-                if b'\n' in chunk:
-                    break
-
-            sock.close()
+            response = self.request(LIST_PING, timeout=timeout)
 
             # If we got a response, registry is healthy
-            if response_data:
-                response = json.loads(response_data.decode('utf-8'))
+            if response:
                 return response.get("success", False)
 
             return False
 
         except (socket.timeout, ConnectionRefusedError, FileNotFoundError):
+            self._socket_seen_at = None
             return False
         except Exception as e:
             self._log(f"Registry health check error: {e}", "debug")
+            self._socket_seen_at = None
             return False
 
     def _kill_registry_process(self):
         """Kill any existing registry processes"""
-        import subprocess
         try:
             self._log("Killing existing registry processes...", "info")
             # Kill any session_registry.py processes
-            subprocess.run(
-                ["pkill", "-f", "session_registry.py"],
-                capture_output=True,
-                timeout=5
-            )
+            if os.path.isdir("/proc/self"):
+                self._signal_registry_processes()
+            else:
+                import subprocess
+                subprocess.run(
+                    ["pkill", "-f", "session_registry.py"],
+                    capture_output=True,
+                    timeout=5
+                )
             # Give processes time to die
             time.sleep(0.5)
             self._log("Registry processes killed", "debug")
@@ -231,8 +308,26 @@ class RegistryClient:
             self._log(f"Error killing registry processes: {e}", "warning")
             return False
 
+    @staticmethod
+    def _signal_registry_processes():
+        """SIGTERM every process whose command line mentions session_registry.py (Linux /proc)"""
+        own_pid = os.getpid()
+        for pid_s in os.listdir("/proc"):
+            if not pid_s.isdigit() or int(pid_s) == own_pid:
+                continue
+            try:
+                with open(f"/proc/{pid_s}/cmdline", "rb") as f:
+                    cmdline = f.read()
+                if b"session_registry.py" in cmdline:
+                    os.kill(int(pid_s), signal.SIGTERM)
+            except (OSError, ProcessLookupError):
+                # Process exited or belongs to another user
+                continue
+
     def _remove_stale_socket(self):
         """Remove stale registry socket file"""
+        self._socket_seen_at = None
+        self.close()
         try:
             if os.path.exists(self.registry_socket_path):
                 self._log(f"Removing stale socket: {self.registry_socket_path}", "info")
@@ -272,7 +367,7 @@ class RegistryClient:
             max_wait = 5
             start_time = time.time()
             while time.time() - start_time < max_wait:
-                if os.path.exists(self.registry_socket_path):
+                if self._socket_exists():
                     self._log("Registry socket detected", "debug")
                     # Give it a moment to fully initialize
                     time.sleep(0.5)
@@ -305,7 +400,7 @@ class RegistryClient:
         self._log("Performing registry health check...", "info")
 
         # Test 1: Check if socket exists
-        socket_exists = os.path.exists(self.registry_socket_path)
+        socket_exists = self._socket_exists()
         self._log(f"Socket exists: {socket_exists}", "debug")
 
         # Test 2: Check if registry is responsive
@@ -343,43 +438,136 @@ class RegistryClient:
             self.available = False
             return False
 
-    def _send_command(self, command, data=None, timeout=8):
-        """Send command to registry and get response"""
-        if not self.available:
-            return None
+    def request(self, message, timeout=8):
+        """
+        Send one message to the registry and return its parsed response.
 
-        try:
-            # Connect to registry
-            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            sock.settimeout(timeout)
-            sock.connect(self.registry_socket_path)
+        message is a dict, or bytes already encoded with encode_message().
 
-            # Prepare message
-            message = {
-                "command": command,
-                "data": data or {}
-            }
+        Uses a warm connection from the process-wide pool when there is one,
+        and returns it to the pool afterwards. If a pooled connection turns
+        out to be dead (e.g. the registry restarted), it reconnects and sends
+        again once.
 
-            # Send command
-            sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+        Returns:
+            Response dict, or None if the registry closed without replying
 
-            # Receive response
-            response_data = b''
-            while True:
-                chunk = sock.recv(4096)
-                if not chunk:
-                    break
-                response_data += chunk
-                if b'\n' in chunk:
-                    break
+        Raises:
+            OSError / socket.timeout on connection failure, ValueError if the
+            response isn't valid JSON
+        """
+        payload = message if isinstance(message, bytes) else encode_message(message)
+
+        for attempt in range(2):
+            pooled = self._get_conn()
+            reused = pooled is not None
+            sock, rx_buf = pooled if reused else (None, b'')
+            try:
+                if sock is None:
+                    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                    sock.settimeout(timeout)
+                    sock.connect(self.registry_socket_path)
+                else:
+                    sock.settimeout(timeout)
+
+                sock.sendall(payload)
+                frame, rx_buf = self._recv_frame(sock, rx_buf)
+            except (BrokenPipeError, ConnectionResetError):
+                sock.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                # Timeouts etc. leave the connection in an unknown state
+                if sock is not None:
+                    sock.close()
+                raise
+
+            if frame is None:
+                # Registry closed the connection
+                sock.close()
+                if reused:
+                    continue
+                return None
+
+            self._release_conn(sock, rx_buf)
+            return decode_message(frame)
+
+        return None
+
+    def _get_conn(self):
+        """
+        Take the most recently used idle connection from the pool.
 
+        Returns:
+            (socket, leftover bytes) or None if no fresh connection is pooled
+        """
+        now = time.monotonic()
+        with _registry_pool_lock:
+            idle = _registry_pool.get(self.registry_socket_path)
+            while idle:
+                sock, rx_buf, idle_since = idle.pop()
+                if now - idle_since < REGISTRY_CONN_IDLE_TTL:
+                    return sock, rx_buf
+                sock.close()
+        return None
+
+    def _release_conn(self, sock, rx_buf):
+        """Return a healthy connection to the pool"""
+        with _registry_pool_lock:
+            _registry_pool.setdefault(self.registry_socket_path, []).append(
+                (sock, rx_buf, time.monotonic())
+            )
+
+    @staticmethod
+    def _recv_frame(sock, rx_buf):
+        """
+        Read one newline-terminated response from a registry connection.
+
+        Chunks are collected in a list and joined once; anything after the
+        newline is handed back to be kept with the connection.
+
+        Args:
+            sock: Connected registry socket
+            rx_buf: Bytes left over from the previous response
+
+        Returns:
+            (response line without its newline, leftover bytes); the line is
+            None if the registry closed the connection first
+        """
+        newline = rx_buf.find(b'\n')
+        if newline != -1:
+            return rx_buf[:newline], rx_buf[newline + 1:]
+
+        parts = [rx_buf]
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                # Closed before a complete line arrived
+                return None, b''
+            newline = chunk.find(b'\n')
+            if newline != -1:
+                parts.append(chunk[:newline])
+                return b''.join(parts), chunk[newline + 1:]
+            parts.append(chunk)
+
+    def close(self):
+        """Close the pooled connections to this registry"""
+        with _registry_pool_lock:
+            idle = _registry_pool.pop(self.registry_socket_path, [])
+        for sock, _, _ in idle:
             sock.close()
 
-            if response_data:
-                return json.loads(response_data.decode('utf-8'))
+    def _send_command(self, command, data=None, timeout=8):
+        """Send command to registry and get response"""
+        if not self.available:
             return None
 
+        try:
+            return self.request({"command": command, "data": data or {}}, timeout=timeout)
+
         except Exception as e:
+            self._socket_seen_at = None
             debug_log(f"Registry communication error: {e}")
             return None
 
@@ -415,8 +603,14 @@ class HybridPTYWrapper:
         self.project_dir = project_dir
         self.claude_args = claude_args or []
 
+        # Status line framing, encoded once (see _status)
+        self._status_prefix = f"{GREEN}[Session {session_id}] ".encode()
+        self._status_suffix = f"{RESET}\n".encode()
+
         # Setup logging
-        self.logger = setup_logging(session_id)
+        self.logger, self.log_listener = setup_logging(session_id)
+        # Stopped at exit rather than in cleanup(), which can run twice
+        atexit.register(self.stop_log_listener)
         self.logger.info("="*60)
         self.logger.info("WRAPPER STARTUP")
         self.logger.info(f"Session ID: {session_id}")
@@ -425,7 +619,8 @@ class HybridPTYWrapper:
         self.logger.info(f"Python version: {sys.version}")
         self.logger.info(f"Working directory: {os.getcwd()}")
 
-        # VibeTunnel detection
+        # VibeTunnel detection (the environment doesn't change, so check once)
+        self._is_vibetunnel = 'VIBETUNNEL_SESSION_ID' in os.environ
         if self.is_vibetunnel():
             self.logger.info("VibeTunnel detected - will use no-PTY mode")
 
@@ -439,9 +634,18 @@ class HybridPTYWrapper:
         self.master_fd = None
         self.socket = None
         self.socket_thread = None
+        self.connections_received = 0
+        self.wakeup_r = None  # Self-pipe that wakes the I/O thread (socket_listener or pty_io_loop)
+        self.wakeup_w = None
+        self._pending_buffer_file = None  # Buffer file path for pty_io_loop to switch to
         self.running = True
         self.using_alternate_screen = False
 
+        # Input waiting for Claude's PTY to become writable, and when each
+        # pending Enter for injected Slack text is due (PTY loop only)
+        self._pty_writes = deque()
+        self._enter_due = deque()
+
         # Registry client (pass logger for health check logging)
         self.registry = RegistryClient(session_id, logger=self.logger)
         self.logger.info(f"Registry client created, available: {self.registry.available}")
@@ -451,12 +655,28 @@ class HybridPTYWrapper:
         self.channel = None
 
         # Output buffer for capturing exact permission prompts (4KB ring buffer)
-        # Increased from 1KB to 4KB to capture all 3 permission options
-        self.output_buffer = deque(maxlen=4096)
-        self.buffer_file = f"/tmp/claude_output_{session_id}.txt"
-        self.buffer_lock = threading.Lock()
+        # Increased from 1KB to 4KB to capture all 3 permission options.
+        # A preallocated bytearray with a write cursor, so each PTY read is a
+        # slice copy rather than one deque entry per byte.
+        self._ring = bytearray(OUTPUT_BUFFER_SIZE)
+        self._ring_view = memoryview(self._ring)  # For copy-free reads of the ring
+        self._ring_pos = 0  # Next write offset
+        self._ring_full = False  # True once the buffer has wrapped
+        # Only the PTY loop touches the ring and the buffer file (other
+        # threads hand it work through the wakeup pipe), so there is no lock
+        self.buffer_file = os.path.join(OUTPUT_BUFFER_DIR, f"claude_output_{session_id}.txt")
+        # The buffer file stays open for the wrapper's lifetime. New output is
+        # appended (O_APPEND, so writes land at the end even after the hook
+        # truncates it); readers should take the last OUTPUT_BUFFER_SIZE bytes
+        self._buf_fd = os.open(self.buffer_file, BUFFER_FILE_FLAGS, 0o600)
+        self._buf_len = 0  # Bytes appended since the file was last compacted
         self.logger.info(f"Output buffer initialized: {self.buffer_file}")
 
+        # Reusable buffers for PTY reads (os.readv fills them in place, so a
+        # read doesn't allocate a new bytes object)
+        self._read_bufs = [bytearray(PTY_READ_SIZE), bytearray(PTY_READ_SIZE)]
+        self._read_views = [memoryview(b) for b in self._read_bufs]
+
     def setup_socket_directory(self):
         """Create socket directory if it doesn't exist"""
         os.makedirs(SOCKET_DIR, exist_ok=True)
@@ -476,11 +696,22 @@ class HybridPTYWrapper:
         self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
         self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
         self.socket.bind(self.socket_path)
-        self.socket.listen(128)
-        self.socket.settimeout(1.0)  # Allow shutdown checks
+        # Accepted connections inherit these buffer sizes. Linux may round or
+        # auto-tune them, and some platforms refuse, so failure is not fatal.
+        for option in (socket.SO_RCVBUF, socket.SO_SNDBUF):
+            try:
+                self.socket.setsockopt(socket.SOL_SOCKET, option, SOCKET_BUFFER_SIZE)
+            except OSError as e:
+                self.logger.debug(f"Could not set socket buffer size: {e}")
+        # Backlog is capped by the kernel (somaxconn) anyway
+        self.socket.listen(min(socket.SOMAXCONN, 4096))
+        # Non-blocking so socket_listener can drain all pending connections;
+        # it sleeps on a selector rather than polling with a timeout
+        self.socket.setblocking(False)
+        self.wakeup_r, self.wakeup_w = os.pipe()
         self.logger.info(f"Unix socket created and listening: {self.socket_path}")
 
-        print(f"{GREEN}[Session {self.session_id}] Input socket: {self.socket_path}{RESET}", file=sys.stderr)
+        self._status(f"Input socket: {self.socket_path}")
 
     def setup_environment(self):
         """Set up environment variables for Claude Code and hooks"""
@@ -490,6 +721,9 @@ class HybridPTYWrapper:
         # Export project directory for hooks
         os.environ["CLAUDE_PROJECT_DIR"] = self.project_dir
 
+        # Export output buffer path so the notification hook can open it directly
+        os.environ["CLAUDE_OUTPUT_BUFFER"] = self.buffer_file
+
         # Verify .claude/settings.local.json is accessible
         settings_path = os.path.join(self.project_dir, ".claude", "settings.local.json")
         if os.path.exists(settings_path):
@@ -500,6 +734,52 @@ class HybridPTYWrapper:
         debug_log(f"Environment: CLAUDE_SESSION_ID={self.session_id}")
         debug_log(f"Environment: CLAUDE_PROJECT_DIR={self.project_dir}")
 
+    def wait_for_slack_thread(self, max_wait=10):
+        """
+        Wait for the registry to store this session's Slack thread.
+
+        The REGISTER command creates the thread asynchronously. Rather than
+        polling, re-query only when the registry writes to its database
+        directory (inotify), falling back to 0.5s polling elsewhere. Queries
+        go through the registry client's pooled connection, not a new
+        database connection each time.
+        """
+        self.logger.info("Waiting for async Slack thread creation...")
+        db_path = get_registry_db_path()
+        # WAL mode writes land in registry.db-wal, so watch the directory
+        watch_fd = open_inotify_watch(os.path.dirname(db_path), IN_MODIFY | IN_CREATE | IN_MOVED_TO)
+        get_message = encode_message({"command": "GET", "data": {"session_id": self.session_id}})
+        start_time = time.time()
+
+        try:
+            while True:
+                try:
+                    # Ask the registry whether the thread was created
+                    response = self.registry.request(get_message, timeout=2)
+                    session = response.get("session") if response else None
+
+                    if session and session.get("thread_ts") and session.get("channel"):
+                        self.thread_ts = session["thread_ts"]
+                        self.channel = session["channel"]
+                        self.logger.info(f"Slack thread created: {self.thread_ts} in {self.channel}")
+                        return True
+                except Exception as e:
+                    self.logger.debug(f"Error checking thread status: {e}")
+
+                remaining = max_wait - (time.time() - start_time)
+                if remaining <= 0:
+                    break
+                if watch_fd is None:
+                    time.sleep(min(0.5, remaining))
+                else:
+                    wait_for_inotify(watch_fd, remaining)
+        finally:
+            if watch_fd is not None:
+                os.close(watch_fd)
+
+        self.logger.warning("Timeout waiting for Slack thread creation")
+        return False
+
     def detect_claude_session_id(self, timeout=5):
         """
         Detect Claude's actual session ID from transcript file.
@@ -513,47 +793,72 @@ class HybridPTYWrapper:
         Returns:
             Claude's session ID (full UUID) or None if not found
         """
-        import glob
-        import time
-
         self.logger.info("Detecting Claude session ID from transcript file")
 
         # Claude stores transcripts in ~/.claude/projects/<escaped-project-path>/
         # Claude replaces both / and _ with - in directory names
         claude_dir = Path.home() / ".claude" / "projects"
-        project_escaped = str(self.project_dir).replace("/", "-").replace("_", "-")
-        transcript_dir = claude_dir / project_escaped
+        transcript_dir = claude_dir / str(self.project_dir).translate(PROJECT_DIR_ESCAPES)
 
         self.logger.debug(f"Transcript directory: {transcript_dir}")
         debug_log(f"Looking for Claude transcript in: {transcript_dir}")
 
+        # On Linux, sleep until a file is created in the directory rather than
+        # polling every 100ms. The watch is added before the first scan so a
+        # file created in between isn't missed.
+        watch_fd = None
+        try:
+            os.makedirs(transcript_dir, exist_ok=True)
+            watch_fd = open_inotify_watch(transcript_dir, IN_CREATE | IN_MOVED_TO)
+        except OSError as e:
+            self.logger.debug(f"Transcript directory watch unavailable: {e}")
+        self.logger.debug(f"Waiting for transcript with inotify={watch_fd is not None}")
+
+        try:
+            return self._wait_for_transcript(transcript_dir, timeout, watch_fd)
+        finally:
+            if watch_fd is not None:
+                os.close(watch_fd)
+
+    def _wait_for_transcript(self, transcript_dir, timeout, watch_fd):
+        """Scan transcript_dir for the newest transcript until one appears or timeout"""
         # Wait for Claude to create transcript file
         start_time = time.time()
         attempt = 0
         while time.time() - start_time < timeout:
             attempt += 1
-            if transcript_dir.exists():
-                # Get all transcript files sorted by modification time (newest first)
-                # Filter out agent files (they start with "agent-")
-                # Note: Claude creates empty transcript files initially, so don't filter by size
-                transcript_files = sorted(
-                    [p for p in transcript_dir.glob("*.jsonl")
-                     if not p.stem.startswith("agent-")],
-                    key=lambda p: p.stat().st_mtime,
-                    reverse=True
-                )
-
-                if transcript_files:
-                    # Get the newest non-agent transcript file with content
-                    latest = transcript_files[0]
-                    # Extract session ID from filename (remove .jsonl extension)
-                    claude_session_id = latest.stem
-                    elapsed = time.time() - start_time
-                    self.logger.info(f"Detected Claude session ID: {claude_session_id} (took {elapsed:.2f}s, {attempt} attempts)")
-                    debug_log(f"Detected Claude session ID: {claude_session_id}")
-                    return claude_session_id
-
-            time.sleep(0.1)
+            # Find the newest transcript file in one directory pass
+            # Filter out agent files (they start with "agent-")
+            # Note: Claude creates empty transcript files initially, so don't filter by size
+            claude_session_id = None
+            newest_mtime = -1.0
+            try:
+                with os.scandir(transcript_dir) as entries:
+                    for entry in entries:
+                        name = entry.name
+                        if not name.endswith(".jsonl") or name.startswith("agent-"):
+                            continue
+                        try:
+                            mtime = entry.stat().st_mtime
+                        except FileNotFoundError:
+                            continue
+                        if mtime > newest_mtime:
+                            newest_mtime = mtime
+                            # Session ID is the filename without .jsonl
+                            claude_session_id = name[:-6]
+            except FileNotFoundError:
+                pass  # Claude hasn't created the directory yet
+
+            if claude_session_id:
+                elapsed = time.time() - start_time
+                self.logger.info(f"Detected Claude session ID: {claude_session_id} (took {elapsed:.2f}s, {attempt} attempts)")
+                debug_log(f"Detected Claude session ID: {claude_session_id}")
+                return claude_session_id
+
+            if watch_fd is None:
+                time.sleep(0.1)
+            else:
+                wait_for_inotify(watch_fd, timeout - (time.time() - start_time))
 
         self.logger.warning(f"Could not detect Claude session ID after {timeout}s ({attempt} attempts)")
         debug_log(f"Could not detect Claude session ID after {timeout}s")
@@ -590,7 +895,7 @@ class HybridPTYWrapper:
             self.thread_ts = self.registry.thread_ts
             self.channel = self.registry.channel
             self.logger.info(f"Registration successful - thread_ts: {self.thread_ts}, channel: {self.channel}")
-            print(f"{GREEN}[Session {self.session_id}] Registered with session registry{RESET}", file=sys.stderr)
+            self._status("Registered with session registry")
             if self.thread_ts:
                 debug_log(f"Created Slack thread: ts={self.thread_ts}, channel={self.channel}")
             return True
@@ -609,7 +914,7 @@ class HybridPTYWrapper:
             claude_session_id: Claude's full UUID session ID
         """
         self.logger.info(f"Attempting to register Claude session ID: {claude_session_id}")
-        self.logger.debug(f"Registry available: {self.registry.available}, thread_ts: {self.thread_ts}, channel: {self.channel}")
+        self.logger.debug("Registry available: %s, thread_ts: %s, channel: %s", self.registry.available, self.thread_ts, self.channel)
 
         if not self.registry.available or not self.thread_ts:
             self.logger.warning(f"Cannot register Claude session - registry: {self.registry.available}, thread_ts: {self.thread_ts}")
@@ -618,16 +923,8 @@ class HybridPTYWrapper:
         self.logger.info(f"Registering Claude session ID: {claude_session_id}")
 
         try:
-            # Connect to registry and send REGISTER_EXISTING command
+            # Send REGISTER_EXISTING over the registry client's connection
             # This registers a new session ID pointing to the same Slack thread
-            self.logger.debug(f"Creating socket to connect to: {self.registry.registry_socket_path}")
-            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
-            sock.settimeout(8)
-            self.logger.debug(f"Attempting to connect to registry socket...")
-            sock.connect(self.registry.registry_socket_path)
-            self.logger.debug(f"Connected to registry socket successfully")
-
-            # Send command to register Claude's session ID with existing thread
             message = {
                 "command": "REGISTER_EXISTING",
                 "data": {
@@ -640,50 +937,34 @@ class HybridPTYWrapper:
                 }
             }
 
-            self.logger.debug(f"Sending REGISTER_EXISTING command: {json.dumps(message)[:200]}")
-            sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
-            self.logger.debug(f"Command sent successfully")
+            self.logger.debug("Sending REGISTER_EXISTING command to %s", self.registry.registry_socket_path)
+            response = self.registry.request(message, timeout=8)
+            self.logger.debug("Parsed response: %s", response)
 
-            # Receive response
-            self.logger.debug(f"Waiting for response from registry...")
-            response_data = b''
-            while True:
-                chunk = sock.recv(4096)
-                if not chunk:
-                    break
-                response_data += chunk
-                if b'\n' in chunk:
-                    break
+            if response:
+                if response.get("success"):
+                    self.logger.info(f"Claude session {claude_session_id[:8]} registered successfully")
+                    self._status(f"Claude session ID {claude_session_id[:8]} registered")
+                    debug_log(f"Claude session registered with thread: {self.thread_ts}")
+                    self.claude_session_registered = True  # Mark as registered
 
-            sock.close()
-            self.logger.debug(f"Received response data: {len(response_data)} bytes")
-
-            if response_data:
-                try:
-                    response = json.loads(response_data.decode('utf-8'))
-                    self.logger.debug(f"Parsed response: {response}")
-                    if response.get("success"):
-                        self.logger.info(f"Claude session {claude_session_id[:8]} registered successfully")
-                        print(f"{GREEN}[Session {self.session_id}] Claude session ID {claude_session_id[:8]} registered{RESET}", file=sys.stderr)
-                        debug_log(f"Claude session registered with thread: {self.thread_ts}")
-                        self.claude_session_registered = True  # Mark as registered
-
-                        # Update buffer file path to use Claude's UUID
-                        self.update_buffer_file_path(claude_session_id)
+                    # Update buffer file path to use Claude's UUID
+                    self.update_buffer_file_path(claude_session_id)
 
-                        return True
-                    else:
-                        self.logger.error(f"Registration failed: {response.get('error', 'Unknown error')}")
-                        debug_log(f"Registration failed: {response}")
-                except json.JSONDecodeError as e:
-                    self.logger.error(f"Failed to parse registry response: {e}")
-                    self.logger.error(f"Raw response: {response_data}")
+                    return True
+                else:
+                    self.logger.error(f"Registration failed: {response.get('error', 'Unknown error')}")
+                    debug_log(f"Registration failed: {response}")
             else:
                 self.logger.error("No response received from registry")
 
             debug_log("Failed to register Claude session ID")
             return False
 
+        except json.JSONDecodeError as e:
+            self.logger.error(f"Failed to parse registry response: {e}")
+            debug_log(f"Failed to parse registry response: {e}")
+            return False
         except socket.timeout:
             self.logger.error(f"Timeout connecting to registry at {self.registry.registry_socket_path}")
             debug_log(f"Timeout connecting to registry")
@@ -698,57 +979,260 @@ class HybridPTYWrapper:
             return False
 
     def socket_listener(self):
-        """Thread that listens for Slack bot connections and injects input to PTY"""
+        """
+        Thread that listens for Slack bot connections and injects input.
+
+        Only used in VibeTunnel (no-PTY) mode; in PTY mode pty_io_loop()
+        watches the socket itself.
+        """
         self.logger.info("Socket listener thread started")
-        connections_received = 0
 
-        while self.running:
+        # Wait on the listening socket and the wakeup pipe; cleanup() closes
+        # the pipe's write end, which makes the read end readable (EOF)
+        sel = selectors.DefaultSelector()
+        sel.register(self.socket, selectors.EVENT_READ)
+        sel.register(self.wakeup_r, selectors.EVENT_READ)
+
+        try:
+            while self.running:
+                try:
+                    self.logger.debug("Waiting for socket connection...")
+                    sel.select()
+                    if not self.running:
+                        break
+                    self.accept_socket_connections()
+
+                except Exception as e:
+                    if self.running:
+                        self.logger.error(f"Socket listener error: {e}", exc_info=True)
+                        print(f"{YELLOW}[Session {self.session_id}] Socket error: {e}{RESET}", file=sys.stderr)
+        finally:
+            sel.close()
+            os.close(self.wakeup_r)
+
+        self.logger.info("Socket listener thread ending")
+
+    def accept_socket_connections(self):
+        """Accept and handle every Slack bot connection that is already queued (socket_listener)"""
+        while True:
             try:
-                # Accept connection from Slack bot
-                self.logger.debug("Waiting for socket connection...")
                 conn, addr = self.socket.accept()
-                connections_received += 1
-                self.logger.info(f"Socket connection #{connections_received} accepted")
+            except BlockingIOError:
+                return
+            conn.settimeout(SOCKET_IDLE_TIMEOUT)
+            self.connections_received += 1
+            self.logger.info("Socket connection #%d accepted", self.connections_received)
 
+            try:
                 with conn:
                     # Receive message from Slack bot
-                    data = conn.recv(4096).decode('utf-8').strip()
-
-                    if data:
-                        self.logger.info(f"Received input from Slack: {len(data)} chars")
-                        self.logger.debug(f"Input content: {data[:100]}...")
-                        debug_log(f"Received input from Slack ({len(data)} chars)")
-
-                        # Inject into Claude's stdin
-                        # VibeTunnel mode: use queue (no PTY)
-                        if hasattr(self, 'slack_input_queue'):
-                            # VibeTunnel mode - queue just the text (Enter added in two-step pattern)
-                            # Matches standard mode: text, sleep, \r
-                            self.slack_input_queue.put(data.encode('utf-8'))
-                            self.logger.info("Input queued for VibeTunnel mode")
-                        else:
-                            # Standard mode - write to PTY
-                            bytes_written = os.write(self.master_fd, data.encode('utf-8'))
-                            self.logger.debug(f"Wrote {bytes_written} bytes to PTY master")
-                            time.sleep(0.1)
-                            os.write(self.master_fd, b'\r')
-                            self.logger.info("Input injected successfully with Enter key")
+                    data = conn.recv(SOCKET_BUFFER_SIZE)
+                self.handle_socket_input(data)
+            except Exception as e:
+                self.logger.error(f"Socket input error: {e}", exc_info=True)
+                print(f"{YELLOW}[Session {self.session_id}] Socket error: {e}{RESET}", file=sys.stderr)
+
+    def handle_socket_input(self, data):
+        """Inject one message received from the Slack bot into Claude"""
+        data = data.decode('utf-8').strip()
+
+        if data:
+            self.logger.info("Received input from Slack: %d chars", len(data))
+            self.logger.debug("Input content: %.100s...", data)
+            debug_log(f"Received input from Slack ({len(data)} chars)")
+
+            # Inject into Claude's stdin
+            # VibeTunnel mode: use queue (no PTY)
+            if hasattr(self, 'slack_input_queue'):
+                # VibeTunnel mode - queue just the text (Enter added in two-step pattern)
+                # Matches standard mode: text, sleep, \r
+                self.slack_input_queue.put(data.encode('utf-8'))
+                self.logger.info("Input queued for VibeTunnel mode")
+            else:
+                # Standard mode - write to PTY; the Enter key follows once
+                # INPUT_ENTER_DELAY has passed (pty_io_loop sends it)
+                if INPUT_ENTER_DELAY:
+                    self._pty_writes.append(data.encode('utf-8'))
+                    self._enter_due.append(time.monotonic() + INPUT_ENTER_DELAY)
+                else:
+                    # Text and Enter in a single write
+                    self._pty_writes.append(data.encode('utf-8') + b'\r')
+                self._write_pty_input()
+                self.logger.info("Input queued for PTY with Enter key")
+
+            debug_log("Input injected successfully")
+
+    def _write_pty_input(self):
+        """Write queued input to Claude's PTY until it would block"""
+        writes = self._pty_writes
+        while writes:
+            data = writes[0]
+            try:
+                n = os.write(self.master_fd, data)
+            except BlockingIOError:
+                return
+            if n < len(data):
+                writes[0] = data[n:]
+                return
+            writes.popleft()
+
+    def _accept_pty_clients(self, sel, clients):
+        """Accept queued Slack bot connections and watch them for data (PTY loop)"""
+        while True:
+            try:
+                conn, addr = self.socket.accept()
+            except BlockingIOError:
+                return
+            conn.setblocking(False)
+            self.connections_received += 1
+            self.logger.info("Socket connection #%d accepted", self.connections_received)
+            # [connection, data so far, idle deadline]
+            client = [conn, bytearray(), time.monotonic() + SOCKET_IDLE_TIMEOUT]
+            clients[conn.fileno()] = client
+            sel.register(conn, selectors.EVENT_READ, client)
+
+    def _read_pty_client(self, sel, clients, client):
+        """Read from a Slack bot connection; inject its message once it closes (PTY loop)"""
+        conn, data, _ = client
+        try:
+            chunk = conn.recv(SOCKET_BUFFER_SIZE - len(data))
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self.logger.error(f"Socket input error: {e}")
+            self._close_pty_client(sel, clients, client)
+            return
 
-                        debug_log("Input injected successfully")
+        if chunk:
+            data += chunk
+            client[2] = time.monotonic() + SOCKET_IDLE_TIMEOUT
+            if len(data) < SOCKET_BUFFER_SIZE:
+                return
 
-            except socket.timeout:
-                # Timeout allows periodic check of self.running flag
-                continue
-            except Exception as e:
-                if self.running:
-                    self.logger.error(f"Socket listener error: {e}", exc_info=True)
-                    print(f"{YELLOW}[Session {self.session_id}] Socket error: {e}{RESET}", file=sys.stderr)
+        # The bot closes the connection after sending (or the message hit the size limit)
+        self._close_pty_client(sel, clients, client)
+        try:
+            self.handle_socket_input(bytes(data))
+        except Exception as e:
+            self.logger.error(f"Socket input error: {e}", exc_info=True)
+            print(f"{YELLOW}[Session {self.session_id}] Socket error: {e}{RESET}", file=sys.stderr)
+
+    @staticmethod
+    def _close_pty_client(sel, clients, client):
+        """Stop watching a Slack bot connection and close it"""
+        conn = client[0]
+        del clients[conn.fileno()]
+        sel.unregister(conn)
+        conn.close()
+
+    def pty_io_loop(self, has_terminal):
+        """
+        Pass data between the terminal, Claude's PTY and the Slack input socket.
+
+        One selector watches Claude's output, the user's keyboard (if there is
+        a terminal) and the input socket, so a single thread drives all of
+        them and sleeps until one is ready. Nothing here blocks: Slack
+        connections are read as data arrives, input for Claude is queued
+        until its PTY is writable, and the delayed Enter after Slack text is
+        a select() deadline. Returns when Claude exits or the terminal closes.
+        """
+        stdin_fd = sys.stdin.fileno() if has_terminal else None
+        stdout_fd = sys.stdout.fileno()
+        socket_fd = self.socket.fileno()
+        clients = {}  # Slack bot connections still being read, by fd
+
+        # Claude may be blocked writing output that only this thread drains,
+        # so a write to its PTY must never block
+        os.set_blocking(self.master_fd, False)
+
+        sel = selectors.DefaultSelector()
+        sel.register(self.master_fd, selectors.EVENT_READ)
+        master_events = selectors.EVENT_READ
+        sel.register(self.socket, selectors.EVENT_READ)
+        if self.wakeup_r is not None:
+            sel.register(self.wakeup_r, selectors.EVENT_READ)
+        if has_terminal:
+            sel.register(stdin_fd, selectors.EVENT_READ)
 
-        self.logger.info("Socket listener thread ending")
+        try:
+            while True:
+                # Watch for PTY writability only while input is queued
+                events = selectors.EVENT_READ | (selectors.EVENT_WRITE if self._pty_writes else 0)
+                if events != master_events:
+                    sel.modify(self.master_fd, events)
+                    master_events = events
+
+                # Sleep until the next Enter is due or a connection goes idle
+                deadlines = [client[2] for client in clients.values()]
+                if self._enter_due:
+                    deadlines.append(self._enter_due[0])
+                timeout = max(0, min(deadlines) - time.monotonic()) if deadlines else None
+
+                for key, mask in sel.select(timeout):
+                    if key.fd == stdin_fd:
+                        # User typed something - forward to Claude (a paste
+                        # arrives in one read rather than 1KB at a time)
+                        data = os.read(stdin_fd, PTY_READ_SIZE)
+                        if not data:
+                            return
+                        self._pty_writes.append(data)
+                        self._write_pty_input()
+
+                    elif key.fd == self.master_fd:
+                        if mask & selectors.EVENT_WRITE:
+                            self._write_pty_input()
+                        if not mask & selectors.EVENT_READ:
+                            continue
+                        # Claude output - pass through to terminal unchanged
+                        try:
+                            n = os.readv(self.master_fd, self._read_views)
+                        except BlockingIOError:
+                            continue
+                        if not n:
+                            # Claude exited
+                            return
+                        if n <= PTY_READ_SIZE:
+                            chunks = (self._read_views[0][:n],)
+                        else:
+                            chunks = (self._read_views[0], self._read_views[1][:n - PTY_READ_SIZE])
+                        # Add to output buffer for permission prompt capture
+                        self.add_to_output_buffer(*chunks)
+                        # Write to terminal (hooks will capture this)
+                        os.writev(stdout_fd, chunks)
+
+                    elif key.fd == socket_fd:
+                        # Slack bot connected
+                        self._accept_pty_clients(sel, clients)
+
+                    elif key.fd == self.wakeup_r:
+                        # Another thread handed over a buffer file switch
+                        if not os.read(self.wakeup_r, 512):
+                            sel.unregister(self.wakeup_r)  # Write end closed
+                        new_buffer_file, self._pending_buffer_file = self._pending_buffer_file, None
+                        if new_buffer_file:
+                            self._switch_buffer_file(new_buffer_file)
+
+                    else:
+                        # Data (or EOF) from a Slack bot connection
+                        self._read_pty_client(sel, clients, key.data)
+
+                now = time.monotonic()
+                while self._enter_due and self._enter_due[0] <= now:
+                    # Enter key for injected Slack text
+                    self._enter_due.popleft()
+                    self._pty_writes.append(b'\r')
+                    self._write_pty_input()
+                for client in [c for c in clients.values() if c[2] <= now]:
+                    self.logger.warning("Dropping Slack connection idle for %ss", SOCKET_IDLE_TIMEOUT)
+                    self._close_pty_client(sel, clients, client)
+        finally:
+            for client in list(clients.values()):
+                self._close_pty_client(sel, clients, client)
+            sel.close()
 
     def is_vibetunnel(self):
         """Check if running in VibeTunnel environment"""
-        return 'VIBETUNNEL_SESSION_ID' in os.environ
+        return self._is_vibetunnel
 
     def handle_window_size_change(self, signum, frame):
         """Signal handler for terminal window size changes (SIGWINCH)"""
@@ -763,7 +1247,7 @@ class HybridPTYWrapper:
             # Update PTY size to match
             fcntl.ioctl(self.master_fd, termios.TIOCSWINSZ, struct.pack('HHHH', rows, cols, 0, 0))
             
-            self.logger.debug(f"Window size updated: {cols}x{rows}")
+            self.logger.debug("Window size updated: %dx%d", cols, rows)
         except Exception as e:
             self.logger.error(f"Error updating window size: {e}")
 
@@ -798,6 +1282,17 @@ class HybridPTYWrapper:
         print(f"{GREEN}Hooks will handle output streaming to Slack{RESET}", file=sys.stderr)
         print(f"{BOLD}{CYAN}{separator}{RESET}\n", file=sys.stderr)
 
+    @staticmethod
+    def _write_stdout(data):
+        """Write raw bytes to stdout in one write, bypassing text encoding"""
+        sys.stdout.flush()  # Keep ordering with earlier text writes
+        if hasattr(sys.stdout, 'buffer'):
+            sys.stdout.buffer.write(data)
+            sys.stdout.buffer.flush()
+        else:
+            sys.stdout.write(data.decode())
+            sys.stdout.flush()
+
     def supports_alternate_screen(self):
         """Check if terminal supports alternate screen buffer"""
         if not (sys.stdin.isatty() and sys.stdout.isatty()):
@@ -816,10 +1311,7 @@ class HybridPTYWrapper:
             return
         
         if self.supports_alternate_screen():
-            sys.stdout.write('\x1b[?1049h')  # Enter alternate screen
-            sys.stdout.write('\x1b[2J')       # Clear screen
-            sys.stdout.write('\x1b[H')        # Move cursor to home
-            sys.stdout.flush()
+            self._write_stdout(ENTER_ALT_SCREEN)
             self.using_alternate_screen = True
             self.logger.info("Entered alternate screen buffer")
 
@@ -830,80 +1322,159 @@ class HybridPTYWrapper:
             return
             
         if self.using_alternate_screen:
-            sys.stdout.write('\x1b[?1049l')  # Exit alternate screen
-            sys.stdout.flush()
+            self._write_stdout(EXIT_ALT_SCREEN)
             self.using_alternate_screen = False
             self.logger.info("Exited alternate screen buffer")
 
-    def add_to_output_buffer(self, data):
+    def _status(self, message):
+        """Write a green [Session ...] status line to stderr in a single write"""
+        try:
+            out = sys.stderr.buffer
+        except AttributeError:
+            # stderr replaced by a text-only stream
+            sys.stderr.write((self._status_prefix + message.encode() + self._status_suffix).decode())
+            return
+        sys.stderr.flush()  # Keep ordering with earlier text writes
+        out.write(self._status_prefix + message.encode() + self._status_suffix)
+        out.flush()
+
+    def _ring_write(self, data):
+        """Append bytes to the output ring, overwriting the oldest if full"""
+        n = len(data)
+        if n >= OUTPUT_BUFFER_SIZE:
+            # Only the tail fits
+            self._ring[:] = data[n - OUTPUT_BUFFER_SIZE:]
+            self._ring_pos = 0
+            self._ring_full = True
+            return
+
+        pos = self._ring_pos
+        end = pos + n
+        if end <= OUTPUT_BUFFER_SIZE:
+            self._ring[pos:end] = data
+        else:
+            # Wrap around
+            first = OUTPUT_BUFFER_SIZE - pos
+            self._ring[pos:] = data[:first]
+            self._ring[:n - first] = data[first:]
+        if end >= OUTPUT_BUFFER_SIZE:
+            self._ring_full = True
+        self._ring_pos = end % OUTPUT_BUFFER_SIZE
+
+    def _ring_segments(self):
+        """Return views of the ring contents, oldest first (valid until the next write)"""
+        pos = self._ring_pos
+        if not self._ring_full:
+            return (self._ring_view[:pos],)
+        return (self._ring_view[pos:], self._ring_view[:pos])
+
+    def add_to_output_buffer(self, *chunks):
         """
         Add output data to ring buffer and write to file.
 
         Args:
-            data: Bytes to add to buffer
+            chunks: Bytes-like objects to add to buffer, in order
         """
-        with self.buffer_lock:
-            # Add to ring buffer (automatically drops oldest if full)
-            self.output_buffer.extend(data)
+        # Add to ring buffer (drops oldest bytes if full)
+        for data in chunks:
+            self._ring_write(data)
 
-            # Write entire buffer to file for notification hook to read
-            try:
-                with open(self.buffer_file, 'wb') as f:
-                    f.write(bytes(self.output_buffer))
-            except Exception as e:
-                self.logger.error(f"Failed to write output buffer: {e}")
+        # Append the new output to the file for notification hook to read
+        try:
+            if self._buf_len >= OUTPUT_BUFFER_FILE_MAX:
+                # Compact: the ring already holds the new chunks
+                self._flush_buffer(*self._ring_segments())
+            else:
+                self._buf_len += os.writev(self._buf_fd, chunks)
+        except Exception as e:
+            self.logger.error(f"Failed to write output buffer: {e}")
+
+    def _flush_buffer(self, *segments):
+        """Replace the buffer file's contents with segments, in order"""
+        os.ftruncate(self._buf_fd, 0)
+        self._buf_len = os.writev(self._buf_fd, segments)
 
     def clear_output_buffer(self):
-        """Clear the output buffer (called by notification hook after successful parse)"""
-        with self.buffer_lock:
-            self.output_buffer.clear()
-            try:
-                # Truncate file
-                with open(self.buffer_file, 'wb') as f:
-                    pass  # Empty file
-                self.logger.debug("Output buffer cleared")
-            except Exception as e:
-                self.logger.error(f"Failed to clear output buffer: {e}")
+        """Clear the output buffer (must run on the PTY loop, the ring's only writer)"""
+        self._ring_pos = 0
+        self._ring_full = False
+        try:
+            # Truncate file
+            os.ftruncate(self._buf_fd, 0)
+            self._buf_len = 0
+            self.logger.debug("Output buffer cleared")
+        except Exception as e:
+            self.logger.error(f"Failed to clear output buffer: {e}")
 
     def update_buffer_file_path(self, claude_session_id):
         """
         Update buffer file path to use Claude's actual UUID session ID.
 
+        Called from outside the PTY loop, so while it runs the switch is
+        handed to it through the wakeup pipe rather than done here.
+
         Args:
             claude_session_id: Claude's full UUID session ID
         """
-        old_buffer_file = self.buffer_file
-        new_buffer_file = f"/tmp/claude_output_{claude_session_id}.txt"
+        new_buffer_file = os.path.join(OUTPUT_BUFFER_DIR, f"claude_output_{claude_session_id}.txt")
+        if new_buffer_file == self.buffer_file:
+            # Claude's ID is the wrapper's session ID (the usual case)
+            return
 
-        with self.buffer_lock:
-            try:
-                # Copy existing buffer data to new file if old file exists
-                if os.path.exists(old_buffer_file):
-                    with open(old_buffer_file, 'rb') as old_f:
-                        data = old_f.read()
-                    with open(new_buffer_file, 'wb') as new_f:
-                        new_f.write(data)
-                    # Remove old file
-                    os.remove(old_buffer_file)
-                    self.logger.info(f"Moved buffer file: {old_buffer_file} -> {new_buffer_file}")
-                else:
-                    # Create new file
-                    with open(new_buffer_file, 'wb') as f:
-                        f.write(bytes(self.output_buffer))
-                    self.logger.info(f"Created new buffer file: {new_buffer_file}")
+        if self.master_fd is None:
+            # No PTY loop (VibeTunnel mode), so nothing else writes the buffer
+            self._switch_buffer_file(new_buffer_file)
+            return
 
-                # Update buffer file path
-                self.buffer_file = new_buffer_file
-                self.logger.info(f"Buffer file path updated to use Claude session ID: {claude_session_id[:8]}")
+        self._pending_buffer_file = new_buffer_file
+        try:
+            os.write(self.wakeup_w, b"\0")
+        except (OSError, TypeError) as e:
+            self.logger.error(f"Failed to wake PTY loop for buffer file update: {e}")
 
-            except Exception as e:
-                self.logger.error(f"Failed to update buffer file path: {e}")
+    def _switch_buffer_file(self, new_buffer_file):
+        """Move the output buffer to new_buffer_file (PTY loop, or when there is none)"""
+        old_buffer_file = self.buffer_file
+        try:
+            # Rename the existing file so the open descriptor keeps pointing at it
+            if os.path.exists(old_buffer_file):
+                os.replace(old_buffer_file, new_buffer_file)
+                self.logger.info(f"Moved buffer file: {old_buffer_file} -> {new_buffer_file}")
+            else:
+                # Create new file and write the current ring contents to it
+                new_fd = os.open(new_buffer_file, BUFFER_FILE_FLAGS, 0o600)
+                os.close(self._buf_fd)
+                self._buf_fd = new_fd
+                self._flush_buffer(*self._ring_segments())
+                self.logger.info(f"Created new buffer file: {new_buffer_file}")
+
+            # Update buffer file path
+            self.buffer_file = new_buffer_file
+            self.logger.info(f"Buffer file path updated: {new_buffer_file}")
+
+        except Exception as e:
+            self.logger.error(f"Failed to update buffer file path: {e}")
 
     def cleanup(self):
         """Clean up resources"""
         self.logger.info("Starting cleanup")
         self.running = False
 
+        # Wake the socket listener so it sees running=False
+        if self.wakeup_w is not None:
+            try:
+                os.close(self.wakeup_w)
+            except OSError:
+                pass
+            self.wakeup_w = None
+        if self.socket_thread is None and self.wakeup_r is not None:
+            # No listener thread owns the read end (PTY mode)
+            try:
+                os.close(self.wakeup_r)
+            except OSError:
+                pass
+            self.wakeup_r = None
+
         # Close socket
         if self.socket:
             try:
@@ -920,6 +1491,9 @@ class HybridPTYWrapper:
             except Exception as e:
                 self.logger.error(f"Error removing socket file: {e}")
 
+        # Close registry connection
+        self.registry.close()
+
         # Remove buffer file
         if os.path.exists(self.buffer_file):
             try:
@@ -927,13 +1501,24 @@ class HybridPTYWrapper:
                 self.logger.debug(f"Buffer file removed: {self.buffer_file}")
             except Exception as e:
                 self.logger.error(f"Error removing buffer file: {e}")
+        if self._buf_fd is not None:
+            try:
+                os.close(self._buf_fd)
+            except OSError:
+                pass
+            self._buf_fd = None
 
         self.logger.info("Cleanup completed")
 
+    def stop_log_listener(self):
+        """Flush queued log records and stop the logging thread (idempotent)"""
+        if self.log_listener is not None:
+            self.log_listener.stop()
+            self.log_listener = None
+
     def run(self):
         """Main wrapper logic - spawn Claude in PTY and handle I/O"""
         self.logger.info("Starting main run loop")
-        start_time = time.time()
 
         # VIBETUNNEL OPTIMIZATION: Use no-PTY mode to avoid nested PTY artifacts
         if self.is_vibetunnel():
@@ -961,12 +1546,6 @@ class HybridPTYWrapper:
         # Register with session registry to create Slack thread
         self.register_with_registry()
 
-        # Start socket listener thread
-        self.logger.info("Starting socket listener thread")
-        self.socket_thread = threading.Thread(target=self.socket_listener, daemon=True)
-        self.socket_thread.start()
-        self.logger.debug("Socket listener thread started")
-
         # Find Claude Code binary using config
         claude_bin = get_claude_bin()
 
@@ -1016,41 +1595,12 @@ class HybridPTYWrapper:
                 # The REGISTER command creates the thread asynchronously, so we need to
                 # wait for thread_ts and channel to be populated in the database
                 if self.registry.available and not self.thread_ts:
-                    self.logger.info("Waiting for async Slack thread creation...")
-                    max_wait = 10  # seconds
-                    start_time = time.time()
-
-                    while time.time() - start_time < max_wait:
-                        try:
-                            # Query the database directly to check if thread was created
-                            import sqlite3
-                            db_path = os.environ.get("REGISTRY_DB_PATH", os.path.expanduser("~/.claude/slack/registry.db"))
-                            conn = sqlite3.connect(db_path)
-                            cursor = conn.cursor()
-                            cursor.execute(
-                                "SELECT slack_thread_ts, slack_channel FROM sessions WHERE session_id = ?",
-                                (self.session_id,)
-                            )
-                            row = cursor.fetchone()
-                            conn.close()
-
-                            if row and row[0] and row[1]:
-                                self.thread_ts = row[0]
-                                self.channel = row[1]
-                                self.logger.info(f"Slack thread created: {self.thread_ts} in {self.channel}")
-                                break
-                        except Exception as e:
-                            self.logger.debug(f"Error checking thread status: {e}")
-
-                        time.sleep(0.5)
-
-                    if not self.thread_ts:
-                        self.logger.warning("Timeout waiting for Slack thread creation")
+                    self.wait_for_slack_thread()
 
                 # Session ID is the same for registry and Claude (full UUID), so no
                 # separate registration needed - hooks will find the session directly.
 
-                # Only do I/O loop if we have a terminal
+                # Terminal setup only applies if we have one
                 if has_terminal:
                     # Set up signal handler for window size changes (SIGWINCH)
                     signal.signal(signal.SIGWINCH, self.handle_window_size_change)
@@ -1065,56 +1615,15 @@ class HybridPTYWrapper:
                     attrs = termios.tcgetattr(sys.stdin)
                     attrs[3] = attrs[3] & ~termios.ECHO  # Disable echo
                     termios.tcsetattr(sys.stdin, termios.TCSADRAIN, attrs)
-
-                    try:
-                        # Main I/O loop - simple pass-through
-                        while True:
-                            # Wait for input from either user terminal or Claude's output
-                            r, w, e = select.select([sys.stdin, self.master_fd], [], [], 1.0)
-
-                            if sys.stdin in r:
-                                # User typed something - forward to Claude
-                                data = os.read(sys.stdin.fileno(), 1024)
-                                if data:
-                                    os.write(self.master_fd, data)
-                                else:
-                                    break
-
-                            if self.master_fd in r:
-                                # Claude output - pass through to terminal unchanged
-                                data = os.read(self.master_fd, 1024)
-                                if data:
-                                    # Add to output buffer for permission prompt capture
-                                    self.add_to_output_buffer(data)
-                                    # Write to terminal (hooks will capture this)
-                                    os.write(sys.stdout.fileno(), data)
-                                else:
-                                    break
-
-                    except (OSError, KeyboardInterrupt):
-                        pass
                 else:
-                    # No terminal - just monitor PTY output and forward to stdout
-                    # Socket listener thread handles input from Slack
+                    # No terminal - monitor PTY output and Slack input only
                     self.logger.info("Running in background mode - monitoring PTY output only")
-                    try:
-                        while True:
-                            # Wait for Claude's output only
-                            r, w, e = select.select([self.master_fd], [], [], 1.0)
-
-                            if self.master_fd in r:
-                                # Claude output - pass through to stdout (hooks will capture this)
-                                data = os.read(self.master_fd, 1024)
-                                if data:
-                                    # Add to output buffer for permission prompt capture
-                                    self.add_to_output_buffer(data)
-                                    os.write(sys.stdout.fileno(), data)
-                                else:
-                                    # Claude exited
-                                    break
-
-                    except (OSError, KeyboardInterrupt):
-                        pass
+
+                # Main I/O loop - simple pass-through
+                try:
+                    self.pty_io_loop(has_terminal)
+                except (OSError, KeyboardInterrupt):
+                    pass
 
         finally:
             # Exit alternate screen buffer first (before restoring terminal)
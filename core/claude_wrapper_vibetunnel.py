@@ -123,44 +123,45 @@ def run_vibetunnel_mode(wrapper):
         if wrapper.thread_ts and hasattr(wrapper, 'claude_session_uuid'):
             wrapper.register_claude_session(wrapper.claude_session_uuid)
 
+        # Reap Claude on a helper thread, which then queues a None sentinel,
+        # so the loop below sleeps on the queue instead of waking every 0.5s
+        def wait_for_claude():
+            os.waitpid(pid, 0)
+            wrapper.logger.info("Claude process ended")
+            wrapper.slack_input_queue.put(None)
+
+        reaper = threading.Thread(target=wait_for_claude, daemon=True)
+        reaper.start()
+
         # Monitor for Slack input and write to terminal
         wrapper.logger.info("Monitoring Slack input queue...")
+        import fcntl
+        import termios as term
         try:
             while True:
-                # Check if Claude is still running
-                try:
-                    os.kill(pid, 0)  # Check if process exists
-                except OSError:
-                    wrapper.logger.info("Claude process ended")
+                slack_data = wrapper.slack_input_queue.get()
+                if slack_data is None:
                     break
 
-                # Check Slack queue
-                try:
-                    slack_data = wrapper.slack_input_queue.get(timeout=0.5)
-                    # Inject using two-step pattern: text, sleep, Enter
-                    # Matches standard mode pattern for consistency
-                    import fcntl
-                    import termios as term
-                    import time
-
-                    # Step 1: Inject text bytes
-                    for byte in slack_data:
-                        fcntl.ioctl(sys.stdin, term.TIOCSTI, bytes([byte]))
-                    wrapper.logger.debug(f"Injected {len(slack_data)} bytes to terminal")
-
-                    # Step 2: Sleep (give terminal time to process)
-                    time.sleep(0.1)
-
-                    # Step 3: Inject Enter key (CR)
-                    fcntl.ioctl(sys.stdin, term.TIOCSTI, b'\r')
-                    wrapper.logger.info(f"Input injected with Enter key ({len(slack_data)} bytes + CR)")
-                except queue.Empty:
-                    pass
+                # Inject using two-step pattern: text, sleep, Enter
+                # Matches standard mode pattern for consistency
+
+                # Step 1: Inject text bytes
+                for byte in slack_data:
+                    fcntl.ioctl(sys.stdin, term.TIOCSTI, bytes([byte]))
+                wrapper.logger.debug(f"Injected {len(slack_data)} bytes to terminal")
+
+                # Step 2: Sleep (give terminal time to process)
+                time.sleep(0.1)
+
+                # Step 3: Inject Enter key (CR)
+                fcntl.ioctl(sys.stdin, term.TIOCSTI, b'\r')
+                wrapper.logger.info(f"Input injected with Enter key ({len(slack_data)} bytes + CR)")
 
         except KeyboardInterrupt:
             wrapper.logger.info("Interrupted - terminating Claude")
             os.kill(pid, signal.SIGTERM)
 
         # Wait for Claude to exit
-        os.waitpid(pid, 0)
+        reaper.join()
         wrapper.logger.info("VibeTunnel mode session ended")
@@ -10,6 +10,10 @@ from pathlib import Path
 # Base directory for slack integration
 SLACK_INTEGRATION_DIR = Path(__file__).parent.parent.resolve()
 
+# Output buffer files shared by the wrapper (writer) and the notification
+# hook (reader); shared memory (tmpfs) where available so neither touches disk
+OUTPUT_BUFFER_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else "/tmp"
+
 # Default configuration
 DEFAULT_CONFIG = {
     # Socket and registry paths (in user home for portability and persistence)
@@ -25,6 +29,26 @@ DEFAULT_CONFIG = {
     'claude_bin': None,  # Auto-detect or use environment variable
 }
 
+def load_env_file(path):
+    """Load KEY=value lines from a .env file into os.environ (existing vars win)"""
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except OSError:
+        return
+
+    for line in data.splitlines():
+        line = line.strip()
+        if not line or line[:1] == b'#' or b'=' not in line:
+            continue
+        if line.startswith(b'export '):
+            line = line[7:]
+        key, _, value = line.partition(b'=')
+        value = value.strip()
+        if len(value) >= 2 and value[:1] == value[-1:] and value[:1] in (b'"', b"'"):
+            value = value[1:-1]
+        os.environ.setdefault(key.strip().decode(), value.decode())
+
 def get_config_value(key, default=None):
     """Get configuration value with environment variable override"""
     env_map = {
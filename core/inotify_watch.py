@@ -0,0 +1,64 @@
+"""
+inotify helpers for event-driven waits (Linux)
+
+Used by the wrapper and the hooks to sleep until a file or directory
+changes instead of polling. Elsewhere open_inotify_watch returns None and
+callers fall back to polling.
+"""
+
+import os
+import select
+
+# inotify event masks (linux/inotify.h)
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+
+
+def open_inotify_watch(path, mask):
+    """
+    Create an inotify fd watching path, for event-driven waits.
+
+    Args:
+        path: File or directory to watch (must already exist)
+        mask: inotify event mask
+
+    Returns:
+        Non-blocking inotify fd, or None if inotify is unavailable (non-Linux)
+        or the watch could not be added
+    """
+    try:
+        import ctypes
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (ImportError, OSError, AttributeError):
+        return None
+
+    if fd < 0:
+        return None
+
+    if libc.inotify_add_watch(fd, os.fsencode(path), mask) < 0:
+        os.close(fd)
+        return None
+
+    return fd
+
+
+def wait_for_inotify(fd, timeout):
+    """
+    Block until the inotify fd has events or timeout expires.
+
+    Returns:
+        True if events arrived (and were drained), False on timeout
+    """
+    ready, _, _ = select.select([fd], [], [], max(timeout, 0))
+    if not ready:
+        return False
+    try:
+        # Drain queued events so the next wait blocks again
+        while os.read(fd, 4096):
+            pass
+    except BlockingIOError:
+        pass
+    return True
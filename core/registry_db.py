@@ -1,84 +1,145 @@
 """
 Session Registry Database Schema
 
-SQLite-based session registry with SQLAlchemy ORM.
+SQLite-based session registry using the standard library sqlite3 module.
 Replaces JSON file + manual locking with database transactions.
 
 Benefits:
 - WAL mode enables concurrent reads + single writer
 - Built-in transaction management (no manual locks)
-- Easy migration to PostgreSQL if needed
-- Automatic retry on write conflicts
+- Automatic retry on write conflicts (busy_timeout)
+- No ORM: every operation is one parameterized statement
 """
 
+import sqlite3
+import threading
+import time
 from datetime import datetime
-from sqlalchemy import create_engine, Column, String, DateTime, Index, text
-from sqlalchemy.orm import declarative_base, sessionmaker
 from contextlib import contextmanager
 
-Base = declarative_base()
-
-
-class SessionRecord(Base):
-    """
-    Registry entry for a Claude Code session
-
-    Each session represents an active Claude Code instance that can
-    receive messages from Slack via its Unix domain socket.
-    """
-    __tablename__ = 'sessions'
-
-    # Session identification
-    session_id = Column(String(8), primary_key=True)  # 8-char hex ID
-    project = Column(String(255), nullable=False)     # Project name
-    terminal = Column(String(100), nullable=False)    # Terminal type
-    socket_path = Column(String(512), nullable=False) # Unix socket path
-    project_dir = Column(String(512), nullable=True)  # Full project directory path
-    wrapper_pid = Column(String(20), nullable=True)   # Wrapper process PID (for restart)
-
-    # Slack integration
-    slack_thread_ts = Column(String(50), nullable=True)  # Thread timestamp
-    slack_channel = Column(String(50), nullable=True)    # Channel ID
-    slack_user_id = Column(String(50), nullable=True)    # User ID who initiated session
-    slack_enabled = Column(String(5), nullable=False, default='true')  # Toggle for Slack mirroring
-
-    # Status tracking
-    status = Column(String(20), nullable=False, default='active')  # active/idle/terminated
-    created_at = Column(DateTime, nullable=False, default=datetime.now)
-    last_activity = Column(DateTime, nullable=False, default=datetime.now)
-
+# Registry entry for a Claude Code session. Each session represents an active
+# Claude Code instance that can receive messages from Slack via its Unix
+# domain socket. (Same layout the former SQLAlchemy model created, so existing
+# databases open unchanged.)
+SCHEMA = (
+    """CREATE TABLE IF NOT EXISTS sessions (
+        session_id VARCHAR(8) NOT NULL,      -- Session ID
+        project VARCHAR(255) NOT NULL,       -- Project name
+        terminal VARCHAR(100) NOT NULL,      -- Terminal type
+        socket_path VARCHAR(512) NOT NULL,   -- Unix socket path
+        project_dir VARCHAR(512),            -- Full project directory path
+        wrapper_pid VARCHAR(20),             -- Wrapper process PID (for restart)
+        slack_thread_ts VARCHAR(50),         -- Thread timestamp
+        slack_channel VARCHAR(50),           -- Channel ID
+        slack_user_id VARCHAR(50),           -- User ID who initiated session
+        slack_enabled VARCHAR(5) NOT NULL,   -- Toggle for Slack mirroring ('true'/'false')
+        status VARCHAR(20) NOT NULL,         -- active/idle/terminated
+        created_at INTEGER NOT NULL,         -- Unix seconds
+        last_activity INTEGER NOT NULL,      -- Unix seconds
+        PRIMARY KEY (session_id)
+    )""",
     # Indexes for common queries
-    __table_args__ = (
-        Index('idx_status', 'status'),
-        Index('idx_last_activity', 'last_activity'),
-        Index('idx_slack_thread', 'slack_thread_ts'),
-    )
-
-    def to_dict(self):
-        """Convert to dictionary for JSON serialization"""
-        return {
-            'session_id': self.session_id,
-            'project': self.project,
-            'terminal': self.terminal,
-            'socket_path': self.socket_path,
-            'project_dir': self.project_dir,
-            'wrapper_pid': int(self.wrapper_pid) if self.wrapper_pid else None,
-            'thread_ts': self.slack_thread_ts,
-            'channel': self.slack_channel,
-            'slack_user_id': self.slack_user_id,
-            'slack_enabled': self.slack_enabled == 'true',
-            'status': self.status,
-            'created_at': self.created_at.isoformat() if self.created_at else None,
-            'last_activity': self.last_activity.isoformat() if self.last_activity else None,
-        }
+    "CREATE INDEX IF NOT EXISTS idx_status ON sessions (status)",
+    "CREATE INDEX IF NOT EXISTS idx_last_activity ON sessions (last_activity)",
+    "CREATE INDEX IF NOT EXISTS idx_slack_thread ON sessions (slack_thread_ts)",
+)
+INDEX_NAMES = ('idx_status', 'idx_last_activity', 'idx_slack_thread')
+
+# Rows are selected in this column order and converted by _row_to_dict
+SESSION_COLUMNS = (
+    'session_id', 'project', 'terminal', 'socket_path', 'project_dir', 'wrapper_pid',
+    'slack_thread_ts', 'slack_channel', 'slack_user_id', 'slack_enabled', 'status',
+    'created_at', 'last_activity'
+)
+_SESSION_COLUMNS = ", ".join(SESSION_COLUMNS)
+
+SQL_GET_SESSION = f"SELECT {_SESSION_COLUMNS} FROM sessions WHERE session_id = ?"
+SQL_GET_ACTIVE_BY_THREAD = (
+    f"SELECT {_SESSION_COLUMNS} FROM sessions "
+    "WHERE slack_thread_ts = ? AND slack_channel = ? AND status = 'active' LIMIT 1"
+)
+SQL_LIST_ACTIVE_BY_THREAD = (
+    f"SELECT {_SESSION_COLUMNS} FROM sessions "
+    "WHERE slack_thread_ts = ? AND status = 'active'"
+)
+SQL_GET_BY_THREAD = f"SELECT {_SESSION_COLUMNS} FROM sessions WHERE slack_thread_ts = ? LIMIT 1"
+SQL_GET_BY_THREAD_CHANNEL = (
+    f"SELECT {_SESSION_COLUMNS} FROM sessions "
+    "WHERE slack_thread_ts = ? AND slack_channel = ? LIMIT 1"
+)
+SQL_GET_LATEST_FOR_PROJECT = (
+    f"SELECT {_SESSION_COLUMNS} FROM sessions "
+    "WHERE project_dir = ? AND status = 'active' ORDER BY created_at DESC, rowid DESC LIMIT 1"
+)
+
+# list_sessions selects rows already in to-dict shape (keys, int pid, local
+# ISO timestamps) so each sqlite3.Row maps straight to a dict
+_LIST_COLUMNS = (
+    "session_id, project, terminal, socket_path, project_dir, "
+    "CAST(wrapper_pid AS INTEGER) AS wrapper_pid, "
+    "slack_thread_ts AS thread_ts, slack_channel AS channel, slack_user_id, "
+    "slack_enabled = 'true' AS slack_enabled, status, "
+    "strftime('%Y-%m-%dT%H:%M:%S', created_at, 'unixepoch', 'localtime') AS created_at, "
+    "strftime('%Y-%m-%dT%H:%M:%S', last_activity, 'unixepoch', 'localtime') AS last_activity"
+)
+SQL_LIST_SESSIONS = f"SELECT {_LIST_COLUMNS} FROM sessions ORDER BY sessions.created_at DESC, rowid DESC"
+SQL_LIST_SESSIONS_BY_STATUS = (
+    f"SELECT {_LIST_COLUMNS} FROM sessions WHERE status = ? "
+    "ORDER BY sessions.created_at DESC, rowid DESC"
+)
+SQL_INSERT_SESSION = (
+    f"INSERT INTO sessions ({_SESSION_COLUMNS}) "
+    f"VALUES ({', '.join('?' * len(SESSION_COLUMNS))})"
+)
+SQL_DELETE_SESSION = "DELETE FROM sessions WHERE session_id = ?"
+SQL_DELETE_INACTIVE_SINCE = "DELETE FROM sessions WHERE last_activity < ?"
+
+# Columns update_session may set (last_activity is always set to now)
+UPDATABLE_COLUMNS = frozenset((
+    'slack_thread_ts', 'slack_channel', 'slack_user_id', 'slack_enabled',
+    'status', 'project_dir', 'wrapper_pid'
+))
+
+
+def _now():
+    """Current time as stored in created_at/last_activity (Unix seconds)"""
+    return int(time.time())
+
+
+def _isoformat(value):
+    """Format a stored Unix timestamp as local ISO time (only when serializing)"""
+    return datetime.fromtimestamp(value).isoformat() if value else None
+
+
+def _row_to_dict(row):
+    """Convert a row selected with SESSION_COLUMNS to a JSON-serializable dict"""
+    (session_id, project, terminal, socket_path, project_dir, wrapper_pid,
+     thread_ts, channel, slack_user_id, slack_enabled, status,
+     created_at, last_activity) = row
+    return {
+        'session_id': session_id,
+        'project': project,
+        'terminal': terminal,
+        'socket_path': socket_path,
+        'project_dir': project_dir,
+        'wrapper_pid': int(wrapper_pid) if wrapper_pid else None,
+        'thread_ts': thread_ts,
+        'channel': channel,
+        'slack_user_id': slack_user_id,
+        'slack_enabled': slack_enabled == 'true',
+        'status': status,
+        'created_at': _isoformat(created_at),
+        'last_activity': _isoformat(last_activity),
+    }
 
 
 class RegistryDatabase:
     """
     Database manager for session registry
 
-    Handles SQLite connection with WAL mode for concurrency.
-    Provides context managers for safe transaction handling.
+    Handles SQLite connections with WAL mode for concurrency: one
+    autocommit connection per thread, so each statement is its own
+    transaction unless grouped with transaction().
     """
 
     def __init__(self, db_path: str):
@@ -90,101 +151,142 @@ class RegistryDatabase:
         """
         self.db_path = db_path
 
-        # Create engine with WAL mode for concurrency
-        self.engine = create_engine(
-            f'sqlite:///{db_path}',
-            connect_args={
-                'timeout': 2.0,  # 2 second timeout for write conflicts
-                'check_same_thread': False  # Allow multi-threaded access
-            },
-            echo=False  # Set to True for SQL debugging
-        )
-
-        # Enable WAL mode for concurrent reads + single writer
-        with self.engine.connect() as conn:
-            conn.execute(text("PRAGMA journal_mode=WAL"))
-            conn.execute(text("PRAGMA busy_timeout=2000"))  # 2 second retry
-            conn.execute(text("PRAGMA synchronous=NORMAL"))   # Faster writes, still safe with WAL
-            conn.commit()
-
-        # Create tables
-        Base.metadata.create_all(self.engine)
+        # sqlite3 connections, one per thread
+        self._local = threading.local()
 
-        # Session factory
-        self.SessionLocal = sessionmaker(bind=self.engine, expire_on_commit=False)
+        # Enable WAL mode for concurrent reads + single writer (persists in the file)
+        self.conn.execute("PRAGMA journal_mode=WAL")
 
-    @contextmanager
-    def session_scope(self):
-        """
-        Provide a transactional scope for database operations
+        # Databases created before timestamps became integers
+        self._migrate_timestamps()
 
-        Usage:
-            with db.session_scope() as session:
-                session.add(record)
-                # Automatically committed on success, rolled back on error
-        """
-        session = self.SessionLocal()
-        try:
-            yield session
-            session.commit()
-        except Exception:
-            session.rollback()
-            raise
-        finally:
-            session.close()
+        # Create tables
+        for statement in SCHEMA:
+            self.conn.execute(statement)
+
+    def _migrate_timestamps(self):
+        """Convert DATETIME created_at/last_activity columns to Unix seconds"""
+        if not self._needs_timestamp_migration():
+            return  # New or already migrated
+
+        with self.transaction() as conn:
+            # Check again under the write lock: another process may have
+            # migrated the table since (strftime would read the integers as
+            # Julian days)
+            if not self._needs_timestamp_migration():
+                return
+
+            # Stored values are naive local time; 'utc' converts them to UTC
+            # before taking epoch seconds
+            conn.execute("ALTER TABLE sessions RENAME TO sessions_old")
+            for index in INDEX_NAMES:
+                conn.execute(f"DROP INDEX IF EXISTS {index}")
+            for statement in SCHEMA:
+                conn.execute(statement)
+            select = ", ".join(
+                f"CAST(strftime('%s', {c}, 'utc') AS INTEGER)" if c in ('created_at', 'last_activity') else c
+                for c in SESSION_COLUMNS
+            )
+            conn.execute(f"INSERT INTO sessions ({_SESSION_COLUMNS}) SELECT {select} FROM sessions_old")
+            conn.execute("DROP TABLE sessions_old")
+
+    def _needs_timestamp_migration(self):
+        """True if the sessions table still has DATETIME timestamp columns"""
+        columns = {row[1]: row[2] for row in self.conn.execute("PRAGMA table_info(sessions)")}
+        return columns.get('last_activity', 'INTEGER').upper() != 'INTEGER'
+
+    @staticmethod
+    def _set_pragmas(dbapi_conn):
+        """Apply per-connection SQLite settings"""
+        cursor = dbapi_conn.cursor()
+        cursor.execute("PRAGMA busy_timeout=2000")  # 2 second retry
+        cursor.execute("PRAGMA synchronous=NORMAL")  # Faster writes, still safe with WAL
+        cursor.execute("PRAGMA mmap_size=268435456")  # Read pages via mmap (up to 256MB)
+        cursor.execute("PRAGMA cache_size=-8000")  # 8MB page cache
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+
+    @property
+    def conn(self):
+        """This thread's sqlite3 connection (autocommit), opened on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=2.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            self._set_pragmas(conn)
+            self._local.conn = conn
+        return conn
 
     def get_session(self, session_id: str) -> dict:
         """Get session by ID"""
-        with self.session_scope() as session:
-            record = session.query(SessionRecord).filter_by(session_id=session_id).first()
-            return record.to_dict() if record else None
+        row = self.conn.execute(SQL_GET_SESSION, (session_id,)).fetchone()
+        return _row_to_dict(row) if row else None
 
     def list_sessions(self, status: str = None) -> list:
         """List all sessions, optionally filtered by status"""
-        with self.session_scope() as session:
-            query = session.query(SessionRecord)
-            if status:
-                query = query.filter_by(status=status)
-            records = query.order_by(SessionRecord.created_at.desc()).all()
-            return [r.to_dict() for r in records]
+        if status:
+            rows = self.conn.execute(SQL_LIST_SESSIONS_BY_STATUS, (status,)).fetchall()
+        else:
+            rows = self.conn.execute(SQL_LIST_SESSIONS).fetchall()
+        # slack_enabled comes back as 0/1
+        return [dict(row, slack_enabled=bool(row['slack_enabled'])) for row in rows]
 
     def create_session(self, session_data: dict) -> dict:
         """Create a new session record"""
-        with self.session_scope() as session:
-            record = SessionRecord(
-                session_id=session_data['session_id'],
-                project=session_data.get('project', 'unknown'),
-                terminal=session_data.get('terminal', 'unknown'),
-                socket_path=session_data['socket_path'],
-                project_dir=session_data.get('project_dir'),
-                wrapper_pid=str(session_data.get('wrapper_pid')) if session_data.get('wrapper_pid') else None,
-                slack_thread_ts=session_data.get('thread_ts'),
-                slack_channel=session_data.get('channel'),
-                slack_user_id=session_data.get('slack_user_id'),
-                slack_enabled=session_data.get('slack_enabled', 'true'),
-                status='active',
-                created_at=datetime.now(),
-                last_activity=datetime.now()
-            )
-            session.add(record)
-            session.flush()  # Get the ID before commit
-            return record.to_dict()
+        now = _now()
+        row = (
+            session_data['session_id'],
+            session_data.get('project', 'unknown'),
+            session_data.get('terminal', 'unknown'),
+            session_data['socket_path'],
+            session_data.get('project_dir'),
+            str(session_data.get('wrapper_pid')) if session_data.get('wrapper_pid') else None,
+            session_data.get('thread_ts'),
+            session_data.get('channel'),
+            session_data.get('slack_user_id'),
+            session_data.get('slack_enabled', 'true'),
+            'active',
+            now,
+            now,
+        )
+        self.conn.execute(SQL_INSERT_SESSION, row)
+        return _row_to_dict(row)
 
     def update_session(self, session_id: str, updates: dict) -> bool:
         """Update session fields"""
-        with self.session_scope() as session:
-            record = session.query(SessionRecord).filter_by(session_id=session_id).first()
-            if not record:
-                return False
+        # Update allowed fields
+        columns = [key for key in updates if key in UPDATABLE_COLUMNS]
+        params = [updates[key] for key in columns]
+
+        # Always update last_activity on any update
+        columns.append('last_activity')
+        params.append(_now())
+        params.append(session_id)
+
+        assignments = ", ".join(f"{column} = ?" for column in columns)
+        cursor = self.conn.execute(
+            f"UPDATE sessions SET {assignments} WHERE session_id = ?", params
+        )
+        return cursor.rowcount > 0
 
-            # Update allowed fields
-            for key, value in updates.items():
-                if key in ('slack_thread_ts', 'slack_channel', 'slack_user_id', 'slack_enabled', 'status', 'last_activity', 'project_dir', 'wrapper_pid'):
-                    setattr(record, key, value)
+    @contextmanager
+    def transaction(self):
+        """
+        Group several writes on this thread's connection into one transaction (one WAL commit)
 
-            # Always update last_activity on any update
-            record.last_activity = datetime.now()
-            return True
+        Usage:
+            with db.transaction():
+                db.update_session(a, {...})
+                db.end_session(b)
+        """
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
 
     def toggle_slack(self, session_id: str, enabled: bool) -> bool:
         """Toggle Slack mirroring for a session"""
@@ -192,40 +294,30 @@ class RegistryDatabase:
 
     def delete_session(self, session_id: str) -> bool:
         """Delete a session record"""
-        with self.session_scope() as session:
-            record = session.query(SessionRecord).filter_by(session_id=session_id).first()
-            if not record:
-                return False
-            session.delete(record)
-            return True
+        return self.conn.execute(SQL_DELETE_SESSION, (session_id,)).rowcount > 0
 
     def get_by_thread(self, thread_ts: str, channel: str = None) -> dict:
         """Get session by Slack thread timestamp and optionally channel"""
-        with self.session_scope() as session:
-            query = session.query(SessionRecord).filter_by(slack_thread_ts=thread_ts)
-            if channel:
-                query = query.filter_by(slack_channel=channel)
-            record = query.first()
-            return record.to_dict() if record else None
+        if channel:
+            row = self.conn.execute(SQL_GET_BY_THREAD_CHANNEL, (thread_ts, channel)).fetchone()
+        else:
+            row = self.conn.execute(SQL_GET_BY_THREAD, (thread_ts,)).fetchone()
+        return _row_to_dict(row) if row else None
 
     def get_active_session_by_thread(self, thread_ts: str, channel: str) -> dict:
         """Get active session by Slack thread and channel"""
-        with self.session_scope() as session:
-            record = session.query(SessionRecord).filter_by(
-                slack_thread_ts=thread_ts,
-                slack_channel=channel,
-                status='active'
-            ).first()
-            return record.to_dict() if record else None
+        row = self.conn.execute(SQL_GET_ACTIVE_BY_THREAD, (thread_ts, channel)).fetchone()
+        return _row_to_dict(row) if row else None
+
+    def list_active_sessions_by_thread(self, thread_ts: str) -> list:
+        """List active sessions in a Slack thread (wrapper and Claude UUID sessions)"""
+        rows = self.conn.execute(SQL_LIST_ACTIVE_BY_THREAD, (thread_ts,)).fetchall()
+        return [_row_to_dict(row) for row in rows]
 
     def get_latest_session_for_project(self, project_dir: str) -> dict:
         """Get the most recent session for a project directory"""
-        with self.session_scope() as session:
-            record = session.query(SessionRecord).filter_by(
-                project_dir=project_dir,
-                status='active'
-            ).order_by(SessionRecord.created_at.desc()).first()
-            return record.to_dict() if record else None
+        row = self.conn.execute(SQL_GET_LATEST_FOR_PROJECT, (project_dir,)).fetchone()
+        return _row_to_dict(row) if row else None
 
     def end_session(self, session_id: str) -> bool:
         """Mark a session as ended"""
@@ -233,15 +325,9 @@ class RegistryDatabase:
 
     def cleanup_old_sessions(self, older_than_hours: int = 24) -> int:
         """Delete sessions older than specified hours"""
-        cutoff = datetime.now() - timedelta(hours=older_than_hours)
-        with self.session_scope() as session:
-            count = session.query(SessionRecord).filter(
-                SessionRecord.last_activity < cutoff
-            ).delete()
-            return count
-
+        cutoff = _now() - older_than_hours * 3600
+        return self.conn.execute(SQL_DELETE_INACTIVE_SINCE, (cutoff,)).rowcount
 
-from datetime import timedelta
 
 if __name__ == '__main__':
     # Test the database
@@ -172,19 +172,19 @@ class SessionLifecycle:
         Returns:
             True if state changed, False otherwise
         """
-        # Update activity in registry
-        if self.registry:
-            # Use registry's database backend to update last_activity timestamp
-            from datetime import datetime
-            self.registry.db.update_session(self.session_id, {'last_activity': datetime.now()})
-
-        # Auto-transition from IDLE to ACTIVE
+        # Auto-transition from IDLE to ACTIVE (its status update also
+        # refreshes last_activity, so one write covers both)
         if self.current_state == SessionState.IDLE:
             try:
                 self.transition_to(SessionState.ACTIVE)
                 return True
             except ValueError:
-                return False
+                pass
+
+        # Update activity in registry
+        if self.registry:
+            # An update with no fields just stamps last_activity
+            self.registry.db.update_session(self.session_id, {})
 
         return False
 
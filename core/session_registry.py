@@ -11,7 +11,7 @@ Manages multiple concurrent Claude Code sessions, each with:
 Architecture:
     - Singleton registry (one per system)
     - SQLite database storage with WAL mode for concurrency
-    - Thread-safe operations via SQLAlchemy transactions
+    - Thread-safe operations via SQLite transactions
     - Unix socket server for IPC with Claude sessions
     - Slack integration for thread management
 
@@ -45,19 +45,21 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional, Any
 from enum import Enum
-from dotenv import load_dotenv
+
+try:
+    from core.config import get_socket_dir, get_registry_db_path, load_env_file
+except ModuleNotFoundError:
+    from config import get_socket_dir, get_registry_db_path, load_env_file
 
 # Load environment variables from .env file (in parent directory)
 env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
-load_dotenv(env_path)
+load_env_file(env_path)
 
 # Database backend
 try:
     from core.registry_db import RegistryDatabase
-    from core.config import get_socket_dir, get_registry_db_path
 except ModuleNotFoundError:
     from registry_db import RegistryDatabase
-    from config import get_socket_dir, get_registry_db_path
 
 # Optional Slack integration
 try:
@@ -68,6 +70,11 @@ except ImportError:
     print("[Registry] Warning: slack_sdk not installed, Slack features disabled", file=sys.stderr)
 
 
+# How long post_to_thread() trusts a cached session lookup. Other processes
+# (e.g. the listener's !slack off) write the database directly, so keep it short.
+POST_LOOKUP_TTL = 5.0
+
+
 class SessionStatus(Enum):
     """Session status states"""
     ACTIVE = "active"
@@ -146,6 +153,9 @@ class SessionRegistry:
         elif not SLACK_AVAILABLE:
             self._log("Slack SDK not available, running without Slack integration")
 
+        # session_id -> (expires_at, session dict) for post_to_thread()
+        self._post_lookup_cache = {}
+
         # Socket server
         self.server_socket = None
         self.server_thread = None
@@ -299,6 +309,7 @@ class SessionRegistry:
 
         # Remove from database (atomic operation)
         self.db.delete_session(session_id)
+        self._post_lookup_cache.pop(session_id, None)
 
         # Update pinned message
         if self.slack_client:
@@ -345,6 +356,82 @@ class SessionRegistry:
         """
         return self.db.get_by_thread(thread_ts)
 
+    def _get_session_for_post(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Session lookup for post_to_thread(), cached for POST_LOOKUP_TTL seconds
+
+        Hooks post on every tool call, so most lookups repeat within seconds.
+        Only sessions that already have their Slack thread are cached.
+        """
+        now = time.monotonic()
+        cached = self._post_lookup_cache.get(session_id)
+        if cached and cached[0] > now:
+            return cached[1]
+
+        session = self.db.get_session(session_id)
+        if session and session.get("channel") and session.get("thread_ts"):
+            self._post_lookup_cache[session_id] = (now + POST_LOOKUP_TTL, session)
+        else:
+            self._post_lookup_cache.pop(session_id, None)
+        return session
+
+    def post_to_thread(self, session_id: str, chunks: List[str]) -> Dict[str, Any]:
+        """
+        Post pre-formatted message chunks to a session's Slack thread
+
+        Lets hooks hand off their Slack posts instead of importing the
+        database and Slack SDK and opening their own connections on every
+        invocation. The session lookup runs inline; the Slack calls run in a
+        background thread so the hook can exit right away.
+
+        Args:
+            session_id: Session identifier (wrapper ID or Claude UUID)
+            chunks: Message chunks, posted in order
+
+        Returns:
+            Response dict for the socket client ("queued" chunk count, or
+            "skipped" if mirroring is disabled)
+        """
+        if not self.slack_client:
+            return {"success": False, "error": "Slack integration not configured"}
+
+        session = self._get_session_for_post(session_id)
+        if not session:
+            return {"success": False, "error": f"Session {session_id[:8]} not found"}
+
+        if not session.get("slack_enabled", True):
+            return {"success": True, "skipped": "slack_disabled"}
+
+        channel = session.get("channel")
+        thread_ts = session.get("thread_ts")
+
+        # Self-heal: copy Slack metadata from the wrapper session (first 8 chars)
+        if (not channel or not thread_ts) and len(session_id) > 8:
+            wrapper_session = self.db.get_session(session_id[:8])
+            if wrapper_session and wrapper_session.get("thread_ts") and wrapper_session.get("channel"):
+                channel = wrapper_session["channel"]
+                thread_ts = wrapper_session["thread_ts"]
+                self.db.update_session(session_id, {
+                    'slack_thread_ts': thread_ts,
+                    'slack_channel': channel
+                })
+                self._post_lookup_cache.pop(session_id, None)
+                self._log(f"Self-healed Slack metadata for {session_id[:8]} from wrapper session")
+
+        if not channel or not thread_ts:
+            return {"success": False, "error": f"Session {session_id[:8]} missing Slack metadata"}
+
+        def post_chunks():
+            # Sequential: Slack orders thread replies by arrival
+            for i, chunk in enumerate(chunks):
+                try:
+                    self.slack_client.chat_postMessage(channel=channel, thread_ts=thread_ts, text=chunk)
+                except Exception as e:
+                    self._log(f"Failed to post chunk {i+1}/{len(chunks)} for {session_id[:8]}: {e}")
+
+        threading.Thread(target=post_chunks, daemon=True).start()
+        return {"success": True, "queued": len(chunks)}
+
     def cleanup_old_sessions(self, max_age_hours: int = 24) -> int:
         """
         Archive old ended/crashed sessions
@@ -487,49 +574,38 @@ class SessionRegistry:
                     self._log(f"Server loop error: {e}")
 
     def _handle_connection(self, conn: socket.socket):
-        """Handle individual socket connection"""
+        """
+        Handle individual socket connection.
+
+        Requests are newline-terminated JSON, answered with one response line
+        each. Clients may send several requests over the same connection;
+        the connection is closed when the client closes its end.
+        """
         try:
             self._log("Incoming connection received")
 
-            # Receive data (expecting newline-terminated JSON)
             data = b""
             while True:
-                chunk = conn.recv(4096)
-                if not chunk:
-                    self._log("Connection closed by client (no data)")
-                    break
-                data += chunk
-                # Stop when we receive a newline (end of JSON message)
-                if b"\n" in data:
-                    self._log(f"Received complete message ({len(data)} bytes)")
-                    break
-                if len(data) > 1024 * 1024:  # 1MB limit
-                    raise ValueError("Request too large")
-
-            if not data:
-                self._log("No data received, closing connection")
-                return
-
-            # Remove trailing newline
-            data = data.rstrip(b"\n")
-            self._log(f"Raw request: {data[:200]}")  # Log first 200 chars
-
-            # Parse JSON command
-            try:
-                request = json.loads(data.decode('utf-8'))
-                self._log(f"Parsed command: {request.get('command')}")
-            except json.JSONDecodeError as e:
-                self._log(f"JSON decode error: {e}")
-                response = {"success": False, "error": "Invalid JSON"}
-                conn.sendall((json.dumps(response) + "\n").encode('utf-8'))
-                return
-
-            # Process command
-            response = self._process_command(request)
-            self._log(f"Response: success={response.get('success')}")
-
-            # Send response (with newline terminator)
-            conn.sendall((json.dumps(response) + "\n").encode('utf-8'))
+                newline = data.find(b"\n")
+                if newline == -1:
+                    chunk = conn.recv(4096)
+                    if not chunk:
+                        # A final request may arrive without its newline
+                        if data.strip():
+                            self._handle_request(conn, data)
+                        else:
+                            self._log("Connection closed by client")
+                        break
+                    data += chunk
+                    if len(data) > 1024 * 1024:  # 1MB limit
+                        raise ValueError("Request too large")
+                    continue
+
+                # Split off one complete message
+                line, data = data[:newline], data[newline + 1:]
+                self._log(f"Received complete message ({len(line)} bytes)")
+                if line.strip():
+                    self._handle_request(conn, line)
 
         except Exception as e:
             self._log(f"Error handling connection: {e}")
@@ -541,6 +617,27 @@ class SessionRegistry:
         finally:
             conn.close()
 
+    def _handle_request(self, conn: socket.socket, data: bytes):
+        """Parse one request line, process it and send the response line"""
+        self._log(f"Raw request: {data[:200]}")  # Log first 200 chars
+
+        # Parse JSON command
+        try:
+            request = json.loads(data.decode('utf-8'))
+            self._log(f"Parsed command: {request.get('command')}")
+        except json.JSONDecodeError as e:
+            self._log(f"JSON decode error: {e}")
+            response = {"success": False, "error": "Invalid JSON"}
+            conn.sendall((json.dumps(response) + "\n").encode('utf-8'))
+            return
+
+        # Process command
+        response = self._process_command(request)
+        self._log(f"Response: success={response.get('success')}")
+
+        # Send response (with newline terminator)
+        conn.sendall((json.dumps(response) + "\n").encode('utf-8'))
+
     def _process_command(self, request: Dict[str, Any]) -> Dict[str, Any]:
         """
         Process socket command
@@ -551,6 +648,7 @@ class SessionRegistry:
             UNREGISTER: {"command": "UNREGISTER", "data": {"session_id": "..."}}
             GET: {"command": "GET", "data": {"session_id": "..."}}
             LIST: {"command": "LIST", "data": {"status": "active"}}  # status optional
+            POST_MESSAGE: {"command": "POST_MESSAGE", "data": {"session_id": "...", "chunks": ["..."]}}
         """
         command = request.get("command")
         data = request.get("data", {})
@@ -618,6 +716,13 @@ class SessionRegistry:
                 sessions = self.list_sessions(status)
                 return {"success": True, "sessions": sessions}
 
+            elif command == "POST_MESSAGE":
+                session_id = data.get("session_id")
+                chunks = data.get("chunks")
+                if not session_id or not chunks:
+                    return {"success": False, "error": "Missing required fields: session_id, chunks"}
+                return self.post_to_thread(session_id, chunks)
+
             else:
                 return {"success": False, "error": f"Unknown command: {command}"}
 
@@ -917,7 +1022,7 @@ if __name__ == "__main__":
 
         # Send LIST command
         request = {"command": "LIST"}
-        client_socket.sendall(json.dumps(request).encode('utf-8'))
+        client_socket.sendall((json.dumps(request) + "\n").encode('utf-8'))
 
         # Receive response
         response_data = client_socket.recv(4096)
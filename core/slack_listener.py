@@ -44,12 +44,11 @@ from pathlib import Path
 from slack_bolt import App
 from slack_bolt.adapter.socket_mode import SocketModeHandler
 from registry_db import RegistryDatabase
-from config import get_registry_db_path, get_socket_dir
-from dotenv import load_dotenv
+from config import get_registry_db_path, get_socket_dir, load_env_file
 
 # Load environment variables from .env file (in parent directory)
 env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
-load_dotenv(env_path)
+load_env_file(env_path)
 
 # Configuration - use centralized config for consistent paths
 PROJECT_DIR = Path(__file__).parent.parent
@@ -106,37 +105,32 @@ def get_socket_for_thread(thread_ts):
     try:
         # Query all sessions with this thread_ts
         # (there might be multiple: wrapper session + Claude UUID session)
-        with registry_db.session_scope() as session:
-            from registry_db import SessionRecord
-            records = session.query(SessionRecord).filter_by(
-                slack_thread_ts=thread_ts,
-                status='active'
-            ).all()
-
-            if not records:
-                print(f"⚠️  No active session found for thread {thread_ts}", file=sys.stderr)
-                return None
-
-            # Prefer the wrapper session (8 chars) over Claude UUID (36 chars)
-            # The wrapper session is the one that owns the socket
-            wrapper_session = None
-            fallback_session = None
-
-            for record in records:
-                if len(record.session_id) == 8:
-                    wrapper_session = record
-                    break
-                else:
-                    fallback_session = record
+        records = registry_db.list_active_sessions_by_thread(thread_ts)
+
+        if not records:
+            print(f"⚠️  No active session found for thread {thread_ts}", file=sys.stderr)
+            return None
 
-            chosen = wrapper_session or fallback_session
+        # Prefer the wrapper session (8 chars) over Claude UUID (36 chars)
+        # The wrapper session is the one that owns the socket
+        wrapper_session = None
+        fallback_session = None
 
-            if chosen:
-                print(f"✅ Found socket for thread {thread_ts}: {chosen.socket_path} (session {chosen.session_id})", file=sys.stderr)
-                return chosen.socket_path
+        for record in records:
+            if len(record['session_id']) == 8:
+                wrapper_session = record
+                break
             else:
-                print(f"⚠️  Session found but no socket path for thread {thread_ts}", file=sys.stderr)
-                return None
+                fallback_session = record
+
+        chosen = wrapper_session or fallback_session
+
+        if chosen:
+            print(f"✅ Found socket for thread {thread_ts}: {chosen['socket_path']} (session {chosen['session_id']})", file=sys.stderr)
+            return chosen['socket_path']
+        else:
+            print(f"⚠️  Session found but no socket path for thread {thread_ts}", file=sys.stderr)
+            return None
 
     except Exception as e:
         print(f"❌ Error querying registry for thread {thread_ts}: {e}", file=sys.stderr)
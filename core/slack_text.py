@@ -0,0 +1,72 @@
+"""
+Slack message text helpers shared by the hooks
+
+Usage:
+    from slack_text import split_message
+    chunks = split_message(text)
+
+    # Self-test
+    python3 slack_text.py
+"""
+
+
+def split_message(text: str, max_length: int = 39000) -> list:
+    """
+    Split long message into chunks that fit in Slack's 40K char limit.
+
+    Args:
+        text: Message text to split
+        max_length: Max chars per chunk (default: 39000, leaves room for part indicators)
+
+    Returns:
+        List of text chunks
+    """
+    if len(text) <= max_length:
+        return [text]
+
+    # Walk the text by index so each character is copied once
+    chunks = []
+    pos = 0
+    text_len = len(text)
+    while pos < text_len:
+        end = pos + max_length
+        if end >= text_len:
+            chunks.append(text[pos:])
+            break
+
+        # Look for newline near the max length (never at or behind the
+        # cursor, or a small max_length would stop making progress)
+        break_point = text.rfind('\n', max(pos + 1, end - 500), end)
+        if break_point == -1:
+            # No newline found, just split at max_length
+            break_point = end
+
+        chunks.append(text[pos:break_point])
+
+        # Skip the newline(s) at the break
+        pos = break_point
+        while pos < text_len and text[pos] == '\n':
+            pos += 1
+
+    return chunks
+
+
+if __name__ == '__main__':
+    # Newline-heavy text with max_length below the 500-char search window
+    # (used to move the cursor backwards and never return)
+    text = "line of text\n" * 200
+    chunks = split_message(text, max_length=100)
+    assert all(0 < len(c) <= 100 for c in chunks), chunks
+    assert "\n".join(chunks).rstrip("\n") == text.rstrip("\n")
+    print(f"✅ Small max_length: {len(chunks)} chunks")
+
+    # Default size: break on the last newline inside the window
+    text = "a" * 38800 + "\n" + "b" * 1000
+    assert split_message(text) == ["a" * 38800, "b" * 1000]
+    print("✅ Breaks on newline")
+
+    # No newline: hard split at max_length
+    assert split_message("x" * 250, max_length=100) == ["x" * 100, "x" * 100, "x" * 50]
+    print("✅ Hard split without newline")
+
+    print("\n✅ All tests passed!")
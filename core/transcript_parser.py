@@ -32,6 +32,8 @@ class TranscriptParser:
         """
         self.transcript_path = transcript_path
         self.messages: List[Dict[str, Any]] = []
+        self._offset = 0  # Byte offset of the first unparsed line
+        self._inode = None  # Inode the offset refers to
 
     @staticmethod
     def get_transcript_path_from_env() -> Optional[str]:
@@ -87,20 +89,73 @@ class TranscriptParser:
         Returns:
             True if successful, False if file doesn't exist
         """
-        if not os.path.exists(self.transcript_path):
-            return False
-
         self.messages = []
-        with open(self.transcript_path, 'r') as f:
-            for line in f:
-                try:
-                    self.messages.append(json.loads(line))
-                except json.JSONDecodeError:
-                    # Skip malformed lines
-                    continue
+        self._offset = 0
+        try:
+            self._read_appended()
+        except FileNotFoundError:
+            return False
 
         return True
 
+    def refresh(self) -> bool:
+        """
+        Parse only the lines appended since the last load()/refresh().
+
+        Transcripts are append-only, so callers polling for new messages can
+        call this repeatedly instead of re-reading the whole file.
+
+        Returns:
+            True if new messages were parsed, False if nothing changed
+        """
+        try:
+            st = os.stat(self.transcript_path)
+        except OSError:
+            return False
+
+        if st.st_size < self._offset or st.st_ino != self._inode:
+            # File was truncated or replaced - start over
+            self.messages = []
+            self._offset = 0
+
+        if st.st_size == self._offset:
+            return False
+
+        return self._read_appended() > 0
+
+    def _read_appended(self) -> int:
+        """
+        Parse lines from the current offset to end of file.
+
+        A trailing line without a newline is only consumed if it is complete
+        JSON, so a line caught mid-write is re-read on the next refresh().
+
+        Returns:
+            Number of messages parsed
+        """
+        with open(self.transcript_path, 'rb') as f:
+            self._inode = os.fstat(f.fileno()).st_ino
+            f.seek(self._offset)
+            data = f.read()
+
+        count = 0
+        pos = 0
+        while pos < len(data):
+            end = data.find(b'\n', pos)
+            line = data[pos:] if end == -1 else data[pos:end]
+            try:
+                self.messages.append(json.loads(line))
+                count += 1
+            except (json.JSONDecodeError, UnicodeDecodeError):
+                if end == -1:
+                    # Partial last line - leave it for the next read
+                    break
+                # Skip malformed lines
+            pos = len(data) if end == -1 else end + 1
+
+        self._offset += pos
+        return count
+
     def get_assistant_messages(self) -> List[Dict[str, Any]]:
         """
         Get all assistant messages from the transcript.
@@ -48,16 +48,19 @@ Architecture:
     5. Exit 0 (success or failure)
 
 Debug Logging:
+    - Enabled with CLAUDE_SLACK_DEBUG=1 (off by default)
     - All execution logged to /tmp/notification_hook_debug.log
     - Includes timestamps, session info, environment vars
     - Tracks hook lifecycle from entry to exit
 """
 
+import atexit
 import sys
 import json
 import os
+import re
+import time
 from pathlib import Path
-from datetime import datetime
 
 # Hook version (for auto-updates)
 HOOK_VERSION = "2.1.0"
@@ -65,6 +68,9 @@ HOOK_VERSION = "2.1.0"
 # Debug log file path
 DEBUG_LOG = "/tmp/notification_hook_debug.log"
 
+# Debug logging is opt-in (CLAUDE_SLACK_DEBUG=1)
+DEBUG = os.environ.get("CLAUDE_SLACK_DEBUG", "0") == "1"
+
 # Find claude-slack directory dynamically
 # Hooks are templates that get copied to project folders, but they need to find the
 # universal claude-slack installation to import core modules
@@ -83,8 +89,6 @@ def find_claude_slack_dir():
     Raises:
         SystemExit: If $CLAUDE_SLACK_DIR is set but invalid (with helpful error message)
     """
-    import os
-
     # 1. Environment variable override (takes precedence)
     if 'CLAUDE_SLACK_DIR' in os.environ:
         env_path = Path(os.environ['CLAUDE_SLACK_DIR'])
@@ -99,11 +103,22 @@ def find_claude_slack_dir():
             sys.exit(0)  # Don't block Claude
 
     # 2. Search upward from current directory (like git)
-    current = Path.cwd()
-    for parent in [current] + list(current.parents):
-        candidate = parent / '.claude' / 'claude-slack'
-        if (candidate / 'core').exists():
-            return candidate
+    # Plain string paths here; only the result is turned into a Path
+    current = os.getcwd()
+    while True:
+        # Most ancestors have no .claude/ at all - one stat rules them out
+        claude_dir = os.path.join(current, '.claude')
+        if os.path.isdir(claude_dir):
+            candidate = os.path.join(claude_dir, 'claude-slack')
+            if os.path.isdir(os.path.join(candidate, 'core')):
+                # Export so child processes skip the walk
+                os.environ.setdefault('CLAUDE_SLACK_DIR', candidate)
+                return Path(candidate)
+
+        parent = os.path.dirname(current)
+        if parent == current:
+            break
+        current = parent
 
     # 3. Fall back to user home directory
     fallback = Path.home() / '.claude' / 'claude-slack'
@@ -114,30 +129,74 @@ CORE_DIR = CLAUDE_SLACK_DIR / "core"
 PROJECT_DIR = CLAUDE_SLACK_DIR
 
 
+# Local aliases for debug_log() timestamp formatting
+_time = time.time
+_localtime = time.localtime
+_strftime = time.strftime
+
+
+def _timestamp():
+    """Local time as 'YYYY-MM-DD HH:MM:SS.mmm' for debug log lines"""
+    now = _time()
+    ms = int((now - int(now)) * 1000)
+    return f"{_strftime('%Y-%m-%d %H:%M:%S', _localtime(now))}.{ms:03d}"
+
+
+# Open the debug log once per hook run (line-buffered) instead of per line
+_debug_fh = None
+if DEBUG:
+    try:
+        _debug_fh = open(DEBUG_LOG, "a", buffering=1)
+        atexit.register(_debug_fh.close)
+    except OSError as e:
+        print(f"[on_notification.py] DEBUG LOG FAILED: {e}", file=sys.stderr)
+
+
 def debug_log(message: str, section: str = "GENERAL"):
     """
     Log debug message to file with timestamp and section.
 
+    No-op unless CLAUDE_SLACK_DEBUG=1.
+
     Args:
         message: Message to log
         section: Section identifier (e.g., 'INIT', 'TRANSCRIPT', 'SLACK')
     """
+    if _debug_fh is None:
+        return
     try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        with open(DEBUG_LOG, "a") as f:
-            f.write(f"[{timestamp}] [{section}] {message}\n")
+        _debug_fh.write(f"[{_timestamp()}] [{section}] {message}\n")
     except Exception as e:
         # If debug logging fails, log to stderr but don't crash
         print(f"[on_notification.py] DEBUG LOG FAILED: {e}", file=sys.stderr)
 
 
+def debug_log_many(entries):
+    """
+    Log several debug lines with one timestamp and a single write.
+
+    Args:
+        entries: Iterable of (message, section) tuples
+    """
+    if _debug_fh is None:
+        return
+    try:
+        timestamp = _timestamp()
+        _debug_fh.write("".join(f"[{timestamp}] [{section}] {message}\n" for message, section in entries))
+    except Exception as e:
+        print(f"[on_notification.py] DEBUG LOG FAILED: {e}", file=sys.stderr)
+
+
 # Log hook start immediately
-debug_log("=" * 80, "LIFECYCLE")
-debug_log("HOOK STARTED", "LIFECYCLE")
-debug_log(f"Python executable: {sys.executable}", "INIT")
-debug_log(f"Python version: {sys.version}", "INIT")
-debug_log(f"Working directory: {os.getcwd()}", "INIT")
-debug_log(f"Script path: {__file__}", "INIT")
+if DEBUG:
+    debug_log_many([
+        ("=" * 80, "LIFECYCLE"),
+        ("HOOK STARTED", "LIFECYCLE"),
+        (f"Python executable: {sys.executable}", "INIT"),
+        (f"Python version: {sys.version}", "INIT"),
+        (f"Working directory: {os.getcwd()}", "INIT"),
+        (f"Script path: {__file__}", "INIT"),
+    ])
 
 # Ensure core directory exists before adding to path
 if os.path.isdir(CORE_DIR):
@@ -148,45 +207,54 @@ else:
     debug_log(msg, "ERROR")
     print(f"[on_notification.py] {msg}", file=sys.stderr)
 
+# KEY=value lines in .env (comments and blank lines don't match)
+_ENV_RE = re.compile(r'^([^#=\s][^=]*)=(.*)$')
+
+
 # Load environment variables from .env file
 def load_env_file():
     """Load environment variables from claude-slack/.env"""
     env_path = CLAUDE_SLACK_DIR / ".env"
     debug_log(f"Looking for .env at: {env_path}", "ENV")
-    if env_path.exists():
-        debug_log(".env file found, loading...", "ENV")
-        loaded_count = 0
-        with open(env_path) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    # Only set if not already in environment
-                    if key not in os.environ:
-                        os.environ[key] = value
-                        loaded_count += 1
-                        # Log non-sensitive keys
-                        if "TOKEN" not in key and "SECRET" not in key:
-                            debug_log(f"Loaded: {key}={value}", "ENV")
-                        else:
-                            debug_log(f"Loaded: {key}=***REDACTED***", "ENV")
-        debug_log(f"Loaded {loaded_count} environment variables", "ENV")
-    else:
+    try:
+        data = env_path.read_text()
+    except OSError:
         debug_log(".env file not found", "ENV")
+        return
+
+    pairs = [m.groups() for line in data.splitlines() if (m := _ENV_RE.match(line.strip()))]
+
+    # Only set keys not already in environment (first occurrence wins)
+    loaded = {}
+    for key, value in pairs:
+        if key not in os.environ:
+            loaded.setdefault(key, value)
+    os.environ.update(loaded)
+
+    if DEBUG:
+        for key, value in loaded.items():
+            # Log non-sensitive keys
+            if "TOKEN" not in key and "SECRET" not in key:
+                debug_log(f"Loaded: {key}={value}", "ENV")
+            else:
+                debug_log(f"Loaded: {key}=***REDACTED***", "ENV")
+    debug_log(f"Loaded {len(loaded)} environment variables", "ENV")
 
 load_env_file()
 
 # Log all relevant environment variables (redact sensitive ones)
-debug_log("Environment variables:", "ENV")
-for key in ["SLACK_BOT_TOKEN", "REGISTRY_DATA_DIR", "CLAUDE_TRANSCRIPT_PATH"]:
-    value = os.environ.get(key)
-    if value:
-        if "TOKEN" in key:
-            debug_log(f"  {key}=***REDACTED*** (length: {len(value)})", "ENV")
+if DEBUG:
+    env_lines = [("Environment variables:", "ENV")]
+    for key in ["SLACK_BOT_TOKEN", "REGISTRY_DATA_DIR", "CLAUDE_TRANSCRIPT_PATH"]:
+        value = os.environ.get(key)
+        if value:
+            if "TOKEN" in key:
+                env_lines.append((f"  {key}=***REDACTED*** (length: {len(value)})", "ENV"))
+            else:
+                env_lines.append((f"  {key}={value}", "ENV"))
         else:
-            debug_log(f"  {key}={value}", "ENV")
-    else:
-        debug_log(f"  {key}=<not set>", "ENV")
+            env_lines.append((f"  {key}=<not set>", "ENV"))
+    debug_log_many(env_lines)
 
 
 def log_error(message: str):
@@ -201,53 +269,130 @@ def log_info(message: str):
     print(f"[on_notification.py] {message}", file=sys.stderr)
 
 
-def split_message(text: str, max_length: int = 39000) -> list:
+# Precompiled patterns for output buffer parsing (compiled once per hook run)
+_ANSI_RE = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+_ANSI_BYTES_RE = re.compile(_ANSI_RE.pattern.encode())
+
+# Permission-specific anchor keywords, fused so one scan finds the first anchor
+_ANCHOR_RE = re.compile(
+    r'(needs permission|permission to use|wants to|Choose an option|Select one)',
+    re.IGNORECASE
+)
+
+# Permission prompts render at the end of the terminal output, so only the
+# tail of the buffer is decoded and scanned. The wrapper appends to the file
+# and compacts it periodically, so this must match its OUTPUT_BUFFER_SIZE
+OUTPUT_TAIL_BYTES = 4096
+
+# Numbered list items: "1. Some text" or "1) Some text"
+_OPTION_RE = re.compile(r'^\s*(\d+)[\.\)]\s*(.+)$', re.MULTILINE)
+# Byte-level precheck for the above, so buffers without any numbered item
+# are rejected before decoding
+_OPTION_HINT_RE = re.compile(rb'\d[\.\)]')
+
+
+def strip_ansi_codes(text):
     """
-    Split long message into chunks that fit in Slack's 40K char limit.
+    Strip ANSI escape codes from text.
 
     Args:
-        text: Message text to split
-        max_length: Max chars per chunk (default: 39000, leaves room for part indicators)
+        text: String with ANSI codes
 
     Returns:
-        List of text chunks
+        Clean string without ANSI codes
     """
-    if len(text) <= max_length:
-        return [text]
-
-    chunks = []
-    while text:
-        # Find a good breaking point (newline near max_length)
-        if len(text) <= max_length:
-            chunks.append(text)
-            break
+    return _ANSI_RE.sub('', text)
 
-        # Look for newline near the max length
-        break_point = text.rfind('\n', max_length - 500, max_length)
-        if break_point == -1:
-            # No newline found, just split at max_length
-            break_point = max_length
 
-        chunks.append(text[:break_point])
-        text = text[break_point:].lstrip('\n')
+def strip_ansi_bytes(data):
+    """
+    Strip ANSI escape codes from raw terminal bytes, before decoding.
 
-    return chunks
+    Args:
+        data: Bytes with ANSI codes
 
+    Returns:
+        Bytes without ANSI codes (input returned as-is if it has no ESC)
+    """
+    if b'\x1b' not in data:
+        return data
+    return _ANSI_BYTES_RE.sub(b'', data)
 
-def strip_ansi_codes(text):
+
+# Words that mark a numbered list as permission options
+PERMISSION_KEYWORDS = (
+    'approve', 'deny', 'allow', 'yes', 'no', 'reject',
+    'permit', 'grant', 'refuse', 'accept', 'decline'
+)
+# Substring match like the original keyword loop (e.g. 'Approved' counts)
+_PERM_KW_RE = re.compile('|'.join(PERMISSION_KEYWORDS), re.IGNORECASE)
+
+
+def reconstruct_missing_options(group, start_num):
     """
-    Strip ANSI escape codes from text.
+    Prepend standard text for options that scrolled off the buffer.
 
     Args:
-        text: String with ANSI codes
+        group: Captured option strings
+        start_num: Number of the first captured option
 
     Returns:
-        Clean string without ANSI codes
+        Option list starting at option 1
     """
-    import re
-    # Remove ANSI escape sequences
-    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-    return ansi_escape.sub('', text)
+    if start_num == 2:
+        # Missing option 1 - prepend standard text
+        debug_log("Reconstructed option 1: Added 'Approve this time' before captured options", "PARSE")
+        return ["Approve this time"] + group
+    elif start_num == 3:
+        # Missing options 1 and 2 - prepend both
+        # This shouldn't happen often, but handle it
+        debug_log("Reconstructed options 1 & 2: Added standard text before captured option", "PARSE")
+        return ["Approve this time", "Approve commands like this for this project"] + group
+    else:
+        # Has all options or starts with 1
+        return group
+
+
+def iter_option_groups(text):
+    """
+    Yield consecutive numbered lists from text, lazily.
+
+    Matches "1. Some text" or "1) Some text". Permission prompts may start
+    with any number (1, 2, 3) if option 1 scrolled off, so a list can start
+    at any number and ends at the first non-consecutive item.
+
+    Args:
+        text: ANSI-stripped terminal text
+
+    Yields:
+        Tuples of (list of option strings, starting number)
+    """
+    current_group = []
+    current_start_num = None
+    expected_next = None
+
+    for match in _OPTION_RE.finditer(text):
+        num_str, item_text = match.groups()
+        num = int(num_str)
+        if DEBUG:
+            debug_log(f"  Item {num_str}: {item_text[:80]}", "PARSE")
+
+        if num == expected_next:
+            # Continuation of current list (consecutive)
+            current_group.append(item_text.strip())
+            expected_next = num + 1
+            continue
+
+        # Start of new numbered list (can be any starting number)
+        if current_group:
+            yield current_group, current_start_num
+        current_group = [item_text.strip()]
+        current_start_num = num
+        expected_next = num + 1
+
+    # Final group
+    if current_group:
+        yield current_group, current_start_num
 
 
 def parse_permission_prompt_from_output(output_bytes, session_id):
@@ -268,164 +413,92 @@ def parse_permission_prompt_from_output(output_bytes, session_id):
         List of exact permission option strings, or None if not found
     """
     try:
-        # Decode bytes to string
-        output_text = output_bytes.decode('utf-8', errors='ignore')
-
-        # Strip ANSI codes
-        clean_text = strip_ansi_codes(output_text)
-
-        debug_log(f"Parsing output buffer ({len(clean_text)} chars)", "PARSE")
-        debug_log(f"Buffer preview: {clean_text[:200]}", "PARSE")
+        # Only the tail of the buffer matters (the prompt is always near the end)
+        if len(output_bytes) > OUTPUT_TAIL_BYTES:
+            output_bytes = output_bytes[-OUTPUT_TAIL_BYTES:]
+
+        # Strip ANSI codes on the raw bytes, then decode what's left (only
+        # if it could contain a numbered option at all)
+        clean_bytes = strip_ansi_bytes(output_bytes)
+        if _OPTION_HINT_RE.search(clean_bytes) is None:
+            debug_log("No numbered options found in buffer", "PARSE")
+            return None
+        clean_text = clean_bytes.decode('utf-8', errors='ignore')
 
-        import re
+        if DEBUG:
+            debug_log(f"Parsing output buffer ({len(clean_text)} chars)", "PARSE")
+            debug_log(f"Buffer preview: {clean_text[:200]}", "PARSE")
 
         # STEP 1: Find permission-specific anchor keywords
         # These indicate we're in a permission prompt section
-        permission_anchors = [
-            r'needs permission',
-            r'permission to use',
-            r'wants to',
-            r'Choose an option',
-            r'Select one',
-        ]
-
-        anchor_pos = -1
-        matched_anchor = None
-        for anchor in permission_anchors:
-            match = re.search(anchor, clean_text, re.IGNORECASE)
-            if match:
-                anchor_pos = match.start()
-                matched_anchor = anchor
-                debug_log(f"Found permission anchor '{anchor}' at position {anchor_pos}", "PARSE")
-                break
+        match = _ANCHOR_RE.search(clean_text)
+        anchor_pos = match.start() if match else -1
+        matched_anchor = match.group(1) if match else None
+        if match:
+            debug_log(f"Found permission anchor '{matched_anchor}' at position {anchor_pos}", "PARSE")
 
         # If no anchor found, search entire buffer (fallback)
         search_text = clean_text[anchor_pos:] if anchor_pos >= 0 else clean_text
         debug_log(f"Searching for options in {len(search_text)} chars after anchor", "PARSE")
 
-        # STEP 2: Find all numbered list patterns
-        # Match: "1. Some text" or "1) Some text"
-        option_pattern = re.compile(r'^\s*(\d+)[\.\)]\s*(.+)$', re.MULTILINE)
-        matches = option_pattern.findall(search_text)
+        # STEP 2-4: Walk consecutive numbered lists as they are found and stop
+        # at the FIRST group that looks like permission options
+        fallback = None  # First 2-3 item group, used if none has keywords
+        group_count = 0
 
-        if not matches:
-            debug_log("No numbered options found in buffer", "PARSE")
-            return None
+        for i, (group, start_num) in enumerate(iter_option_groups(search_text)):
+            group_count += 1
 
-        debug_log(f"Found {len(matches)} total numbered items", "PARSE")
-        # Log what we found for debugging
-        for num_str, text in matches:
-            debug_log(f"  Item {num_str}: {text[:80]}", "PARSE")
-
-        # STEP 3: Extract consecutive numbered lists
-        # Permission prompts may start with any number (1, 2, 3) if option 1 scrolled off
-        # Track metadata: (group, starting_number)
-        option_groups = []
-        current_group = []
-        current_start_num = None
-        expected_next = None
-
-        for num_str, text in matches:
-            num = int(num_str)
-
-            if expected_next is None:
-                # Start of new numbered list (can be any starting number)
-                if current_group:
-                    option_groups.append((current_group, current_start_num))
-                current_group = [text.strip()]
-                current_start_num = num
-                expected_next = num + 1
-            elif num == expected_next:
-                # Continuation of current list (consecutive)
-                current_group.append(text.strip())
-                expected_next = num + 1
-            else:
-                # Non-consecutive, end current group and start new one
-                if current_group:
-                    option_groups.append((current_group, current_start_num))
-                current_group = [text.strip()]
-                current_start_num = num
-                expected_next = num + 1
-
-        # Add final group
-        if current_group:
-            option_groups.append((current_group, current_start_num))
-
-        debug_log(f"Extracted {len(option_groups)} numbered list groups", "PARSE")
-
-        # STEP 4: Find the FIRST group that looks like permission options
-        # Permission options contain keywords like: approve, deny, allow, yes, no
-        permission_keywords = [
-            'approve', 'deny', 'allow', 'yes', 'no', 'reject',
-            'permit', 'grant', 'refuse', 'accept', 'decline'
-        ]
-
-        for i, (group, start_num) in enumerate(option_groups):
             # Only consider groups with 2-3 options (Claude's permission format)
             if len(group) < 2 or len(group) > 3:
                 debug_log(f"Group {i+1}: Skipping (wrong size: {len(group)} options)", "PARSE")
                 continue
 
             # Check if options contain permission keywords
-            group_text = ' '.join(group).lower()
-            has_permission_keywords = any(keyword in group_text for keyword in permission_keywords)
+            has_permission_keywords = _PERM_KW_RE.search(' '.join(group)) is not None
 
             if has_permission_keywords:
                 debug_log(f"Group {i+1}: MATCH! Found {len(group)} permission options starting at #{start_num}: {group}", "PARSE")
-
                 # STEP 4A: Reconstruct missing option 1 if needed
-                if start_num == 2:
-                    # Missing option 1 - prepend standard text
-                    reconstructed = ["Approve this time"] + group
-                    debug_log(f"Reconstructed option 1: Added 'Approve this time' before captured options", "PARSE")
-                    return reconstructed
-                elif start_num == 3:
-                    # Missing options 1 and 2 - prepend both
-                    # This shouldn't happen often, but handle it
-                    reconstructed = ["Approve this time", "Approve commands like this for this project"] + group
-                    debug_log(f"Reconstructed options 1 & 2: Added standard text before captured option", "PARSE")
-                    return reconstructed
-                else:
-                    # Has all options or starts with 1
-                    return group
-            else:
+                return reconstruct_missing_options(group, start_num)
+
+            if DEBUG:
                 debug_log(f"Group {i+1}: No permission keywords found in: {group[:100]}", "PARSE")
+            if fallback is None:
+                fallback = (i, group, start_num)
+
+        if not group_count:
+            debug_log("No numbered options found in buffer", "PARSE")
+            return None
 
         # STEP 5: Fallback - if no group matched keywords, take first 2-3 item group
-        for i, (group, start_num) in enumerate(option_groups):
-            if 2 <= len(group) <= 3:
-                debug_log(f"FALLBACK: Using group {i+1} ({len(group)} options) starting at #{start_num}: {group}", "PARSE")
-
-                # Still reconstruct missing option 1 even in fallback
-                if start_num == 2:
-                    reconstructed = ["Approve this time"] + group
-                    debug_log(f"FALLBACK: Reconstructed option 1", "PARSE")
-                    return reconstructed
-                elif start_num == 3:
-                    reconstructed = ["Approve this time", "Approve commands like this for this project"] + group
-                    debug_log(f"FALLBACK: Reconstructed options 1 & 2", "PARSE")
-                    return reconstructed
-                else:
-                    return group
+        if fallback:
+            i, group, start_num = fallback
+            debug_log(f"FALLBACK: Using group {i+1} ({len(group)} options) starting at #{start_num}: {group}", "PARSE")
+            # Still reconstruct missing option 1 even in fallback
+            return reconstruct_missing_options(group, start_num)
 
         debug_log("No valid permission options found in buffer", "PARSE")
         return None
 
     except Exception as e:
         debug_log(f"Error parsing permission prompt: {e}", "PARSE")
-        import traceback
-        debug_log(f"Traceback: {traceback.format_exc()}", "PARSE")
+        if DEBUG:
+            import traceback
+            debug_log(f"Traceback: {traceback.format_exc()}", "PARSE")
         return None
 
 
 def retry_parse_transcript(transcript_path, max_wait=2.5, check_interval=0.1):
     """
-    Poll transcript file until permission prompt data appears or timeout.
+    Wait for permission prompt data to appear in the transcript, or timeout.
 
     Implements Approach #1A: Retry Loop with Smart Termination
     - 95% success rate
     - Exits immediately when data found (typically 100-300ms)
     - Graceful timeout at max_wait seconds
+    - On Linux, sleeps on inotify IN_MODIFY instead of polling; elsewhere
+      falls back to polling with backoff
 
     Args:
         transcript_path: Path to transcript JSONL file
@@ -435,124 +508,142 @@ def retry_parse_transcript(transcript_path, max_wait=2.5, check_interval=0.1):
     Returns:
         Dict with tool info or None if timeout/error
     """
-    import time
+    try:
+        from transcript_parser import TranscriptParser
+        from inotify_watch import IN_CLOSE_WRITE, IN_MODIFY, open_inotify_watch, wait_for_inotify
+    except ImportError as e:
+        debug_log(f"transcript_parser not available: {e}", "TRANSCRIPT")
+        return None
 
     start_time = time.time()
     attempt = 0
+    watch_fd = open_inotify_watch(transcript_path, IN_MODIFY | IN_CLOSE_WRITE)
 
-    debug_log(f"Starting retry parse: max_wait={max_wait}s, check_interval={check_interval}s", "TRANSCRIPT")
+    debug_log(f"Starting retry parse: max_wait={max_wait}s, check_interval={check_interval}s, inotify={watch_fd is not None}", "TRANSCRIPT")
 
-    while (time.time() - start_time) < max_wait:
-        attempt += 1
-        elapsed = time.time() - start_time
+    # One parser for all attempts: after the first load() only appended
+    # lines are parsed, and an unchanged file is skipped entirely
+    parser = TranscriptParser(transcript_path)
+    loaded = False
 
-        try:
-            # Import transcript parser
-            from transcript_parser import TranscriptParser
-
-            # Try to parse transcript
-            parser = TranscriptParser(transcript_path)
-            if not parser.load():
-                debug_log(f"Attempt {attempt} ({elapsed:.2f}s): Transcript not ready", "TRANSCRIPT")
-                time.sleep(check_interval)
-                continue
+    try:
+        while (time.time() - start_time) < max_wait:
+            attempt += 1
+            elapsed = time.time() - start_time
 
-            # Get latest assistant message with tool calls
-            response = parser.get_latest_assistant_response(
-                include_tool_calls=True,
-                text_only=False
-            )
+            try:
+                if not loaded:
+                    if not parser.load():
+                        debug_log(f"Attempt {attempt} ({elapsed:.2f}s): Transcript not ready", "TRANSCRIPT")
+                        time.sleep(min(check_interval * (1.1 ** attempt), 0.5))
+                        continue
+                    loaded = changed = True
+                else:
+                    changed = parser.refresh()
 
-            if response and response.get('tool_calls'):
-                # Found it! Return immediately
-                debug_log(f"SUCCESS at attempt {attempt} ({elapsed:.2f}s): Found tool data", "TRANSCRIPT")
-                return response
-            else:
-                debug_log(f"Attempt {attempt} ({elapsed:.2f}s): No tool calls yet", "TRANSCRIPT")
+                if not changed:
+                    debug_log(f"Attempt {attempt} ({elapsed:.2f}s): Transcript unchanged", "TRANSCRIPT")
+                else:
+                    # Get latest assistant message with tool calls
+                    response = parser.get_latest_assistant_response(
+                        include_tool_calls=True,
+                        text_only=False
+                    )
+
+                    if response and response.get('tool_calls'):
+                        # Found it! Return immediately
+                        debug_log(f"SUCCESS at attempt {attempt} ({elapsed:.2f}s): Found tool data", "TRANSCRIPT")
+                        return response
+                    else:
+                        debug_log(f"Attempt {attempt} ({elapsed:.2f}s): No tool calls yet", "TRANSCRIPT")
 
-        except Exception as e:
-            debug_log(f"Attempt {attempt} ({elapsed:.2f}s): Error - {e}", "TRANSCRIPT")
+            except Exception as e:
+                debug_log(f"Attempt {attempt} ({elapsed:.2f}s): Error - {e}", "TRANSCRIPT")
 
-        # Gentle exponential backoff (1.1x multiplier, capped at 0.5s)
-        backoff_wait = min(check_interval * (1.1 ** attempt), 0.5)
-        time.sleep(backoff_wait)
+            if watch_fd is not None:
+                # Sleep until the transcript is written (or we run out of time)
+                wait_for_inotify(watch_fd, max_wait - (time.time() - start_time))
+            else:
+                # Gentle exponential backoff (1.1x multiplier, capped at 0.5s)
+                backoff_wait = min(check_interval * (1.1 ** attempt), 0.5)
+                time.sleep(backoff_wait)
+    finally:
+        if watch_fd is not None:
+            os.close(watch_fd)
 
     # Timeout reached
     debug_log(f"TIMEOUT after {attempt} attempts ({max_wait}s)", "TRANSCRIPT")
     return None
 
 
+# Fixed first/last permission options shared by every prompt variant
+_YES = sys.intern("Yes")
+_DENY_OPTION = sys.intern("No, and tell Claude what to do differently (esc)")
+_YES_DENY_2 = (_YES, _DENY_OPTION)
+_FALLBACK_OPTIONS_3 = (_YES, "Yes, and don't ask again for this operation", _DENY_OPTION)
+
+
 # Exact Claude Code permission text mapping
 # Updated 2025/11/17 based on 14 REAL captured permission prompts
-# Format: (context_type, tool_name, option_count) -> list of exact option strings
+# Format: (context_type, tool_name, option_count) -> tuple of exact option strings
 CLAUDE_PERMISSION_TEXT = {
     # Bash - Directory access (out of scope) - 3 options
-    ("bash_directory_access", "Bash", 3): [
-        "Yes",
+    ("bash_directory_access", "Bash", 3): (
+        _YES,
         "Yes, allow reading from {directory}/ from this project",
-        "No, and tell Claude what to do differently (esc)"
-    ],
+        _DENY_OPTION,
+    ),
 
     # Bash - File commands - 3 options
-    ("bash_file_commands", "Bash", 3): [
-        "Yes",
+    ("bash_file_commands", "Bash", 3): (
+        _YES,
         "Yes, and don't ask again for {file} commands in {location}",
-        "No, and tell Claude what to do differently (esc)"
-    ],
+        _DENY_OPTION,
+    ),
 
     # Bash - Sudo commands - 3 options (usually denied by user)
-    ("bash_sudo", "Bash", 3): [
-        "Yes",
+    ("bash_sudo", "Bash", 3): (
+        _YES,
         "Yes, and don't ask again for sudo {command} commands in {location}",
-        "No, and tell Claude what to do differently (esc)"
-    ],
+        _DENY_OPTION,
+    ),
 
     # Bash - Background process or /tmp operations - ONLY 2 options
-    ("bash_background_or_tmp", "Bash", 2): [
-        "Yes",
-        "No, and tell Claude what to do differently (esc)"
-    ],
+    ("bash_background_or_tmp", "Bash", 2): _YES_DENY_2,
 
     # Write tool - Create file (cross-project) - 3 options
-    ("write_create", "Write", 3): [
-        "Yes",
+    ("write_create", "Write", 3): (
+        _YES,
         "Yes, allow all edits in {directory}/ during this session",
-        "No, and tell Claude what to do differently (esc)"
-    ],
+        _DENY_OPTION,
+    ),
 
     # Edit tool - Modify file (cross-project) - 3 options
-    ("edit_modify", "Edit", 3): [
-        "Yes",
+    ("edit_modify", "Edit", 3): (
+        _YES,
         "Yes, allow all edits in {directory}/ during this session",
-        "No, and tell Claude what to do differently (esc)"
-    ],
+        _DENY_OPTION,
+    ),
 
     # Read operations - Based on original analysis
-    ("read_file", "Read", 3): [
-        "Yes",
+    ("read_file", "Read", 3): (
+        _YES,
         "Yes, allow reading from {directory}/ from this project",
-        "No, and tell Claude what to do differently (esc)"
-    ],
+        _DENY_OPTION,
+    ),
 
     # Task tool - Launching subagents
-    ("task_subagent", "Task", 3): [
-        "Yes",
+    ("task_subagent", "Task", 3): (
+        _YES,
         "Yes, and don't ask again for similar Task operations",
-        "No, and tell Claude what to do differently (esc)"
-    ],
+        _DENY_OPTION,
+    ),
 
     # Fallback for unmatched contexts - 3 options
-    ("default", None, 3): [
-        "Yes",
-        "Yes, and don't ask again for this operation",
-        "No, and tell Claude what to do differently (esc)"
-    ],
+    ("default", None, 3): _FALLBACK_OPTIONS_3,
 
     # Fallback for 2-option scenarios
-    ("default_2_option", None, 2): [
-        "Yes",
-        "No, and tell Claude what to do differently (esc)"
-    ],
+    ("default_2_option", None, 2): _YES_DENY_2,
 }
 
 # Dangerous command patterns
@@ -568,6 +659,43 @@ DANGEROUS_PATTERNS = [
     r'curl.*\|.*sh',
     r'wget.*\|.*sh',
 ]
+_DANGEROUS_RE = re.compile('|'.join(DANGEROUS_PATTERNS))
+
+# Bash command classifier used by determine_permission_context(). Named groups
+# are listed in priority order; BASH_CONTEXTS maps each to its context.
+# 'echo' uses a lookahead so it never swallows a higher-priority match.
+_CLASSIFY_RE = re.compile(
+    r'(?P<background>&\s*$)'
+    r'|(?P<tmp>(?:touch|rm|cat.*>)\s+/tmp/)'
+    r'|(?P<sudo>\bsudo\b)'
+    r'|(?P<ls>\bls\b)'
+    r'|(?P<file_op>echo(?=.*>)|touch|rm\s+(?!-rf))'
+)
+BASH_CONTEXTS = {
+    # Background process or /tmp operations (often get 2 options)
+    'background': ("bash_background_or_tmp", 2),
+    'tmp': ("bash_background_or_tmp", 2),
+    # Sudo commands
+    'sudo': ("bash_sudo", 3),
+    # Directory listing/access (ls, cd to out-of-scope)
+    'ls': ("bash_directory_access", 3),
+    # File operations (echo >, touch, rm, etc.)
+    'file_op': ("bash_file_commands", 3),
+}
+_CLASSIFY_PRIORITY = {name: rank for rank, name in enumerate(BASH_CONTEXTS)}
+
+# Target extractors used by extract_target_from_command()
+_LS_PATH_RE = re.compile(r'ls(?:\s+(?:-[a-zA-Z]+\s+)*)?([^\s]+)')
+_SUDO_CMD_RE = re.compile(r'sudo\s+(\w+)')
+# File target of a redirect (also covers echo > file), touch, or heredoc.
+# Anchored alternatives with lazy prefixes keep the old priority order
+# (any redirect beats touch beats heredoc) in a single pattern
+_FILE_TARGET_RE = re.compile(
+    r'^(?:.*?>\s*(?P<redirect>[^\s;&|]+)'  # Redirect
+    r'|.*?touch\s+(?P<touch>[^\s;&|]+)'  # Touch
+    r'|.*?cat\s*>\s*(?P<heredoc>[^\s<]+)\s*<<)',  # Heredoc
+    re.DOTALL
+)
 
 # ERROR PATTERNS - Operations that cause errors AFTER permission approval
 # Based on 14 real permission prompt tests:
@@ -582,15 +710,12 @@ def extract_target_from_command(tool_name, tool_input):
     Extract the specific target (file/directory/command) from tool input.
     This is what Claude puts in the option 2 text.
     """
-    import re
-    import os
-
     if tool_name == "Bash":
         command = tool_input.get('command', '')
 
         # Extract directory from ls commands
         if command.strip().startswith('ls'):
-            match = re.search(r'ls(?:\s+(?:-[a-zA-Z]+\s+)*)?([^\s]+)', command)
+            match = _LS_PATH_RE.search(command)
             if match:
                 path = match.group(1).rstrip('/')
                 if '/' in path:
@@ -599,24 +724,17 @@ def extract_target_from_command(tool_name, tool_input):
 
         # Extract command from sudo
         if 'sudo' in command:
-            match = re.search(r'sudo\s+(\w+)', command)
+            match = _SUDO_CMD_RE.search(command)
             if match:
                 return f"sudo {match.group(1)}"
 
         # Extract filename from file operations
         # Handle echo > file, touch file, etc
-        patterns = [
-            r'>\s*([^\s;&|]+)',  # Redirect
-            r'touch\s+([^\s;&|]+)',  # Touch
-            r'echo.*>\s*([^\s;&|]+)',  # Echo redirect
-            r'cat\s*>\s*([^\s<]+)\s*<<',  # Heredoc
-        ]
-        for pattern in patterns:
-            match = re.search(pattern, command)
-            if match:
-                path = match.group(1)
-                # Return just the filename
-                return os.path.basename(path)
+        match = _FILE_TARGET_RE.match(command)
+        if match:
+            path = match.group('redirect') or match.group('touch') or match.group('heredoc')
+            # Return just the filename
+            return os.path.basename(path)
 
     elif tool_name == "Write":
         file_path = tool_input.get('file_path', '')
@@ -655,42 +773,28 @@ def determine_permission_context(tool_name, tool_input):
     Returns:
         Tuple of (context_type, expected_option_count)
     """
-    import re
-
     if tool_name == "Bash":
         command = tool_input.get('command', '')
 
-        # Check for background process (& at end)
-        if re.search(r'&\s*$', command):
-            debug_log(f"Detected background process: {command[:50]}", "PERMISSION")
-            return ("bash_background_or_tmp", 2)
-
-        # Check for /tmp operations (often get 2 options)
-        if re.search(r'(touch|rm|cat.*>)\s+/tmp/', command):
-            debug_log(f"Detected /tmp operation: {command[:50]}", "PERMISSION")
-            return ("bash_background_or_tmp", 2)
-
-        # Check for sudo commands
-        if re.search(r'\bsudo\b', command):
-            debug_log(f"Detected sudo command: {command[:50]}", "PERMISSION")
-            return ("bash_sudo", 3)
-
-        # Check for directory listing/access (ls, cd to out-of-scope)
-        if re.search(r'\bls\b', command):
-            debug_log(f"Detected directory access: {command[:50]}", "PERMISSION")
-            return ("bash_directory_access", 3)
-
-        # Check for file operations (echo >, touch, rm, etc.)
-        if re.search(r'(echo.*>|touch|rm\s+(?!-rf))', command):
-            debug_log(f"Detected file command: {command[:50]}", "PERMISSION")
-            return ("bash_file_commands", 3)
+        # Classify in one scan: background > /tmp > sudo > ls > file op
+        best = None
+        for match in _CLASSIFY_RE.finditer(command):
+            kind = match.lastgroup
+            if best is None or _CLASSIFY_PRIORITY[kind] < _CLASSIFY_PRIORITY[best]:
+                best = kind
+                if _CLASSIFY_PRIORITY[kind] == 0:
+                    break
+
+        if best:
+            debug_log(f"Detected {best} command: {command[:50]}", "PERMISSION")
+            return BASH_CONTEXTS[best]
 
         # Check for dangerous patterns (rm -rf, etc.)
-        for pattern in DANGEROUS_PATTERNS:
-            if re.search(pattern, command):
-                debug_log(f"Detected dangerous pattern {pattern}: {command[:50]}", "PERMISSION")
-                # Note: rm -rf in chains still gets 3 options based on our testing
-                return ("bash_file_commands", 3)
+        match = _DANGEROUS_RE.search(command)
+        if match:
+            debug_log(f"Detected dangerous pattern {match.group(0)!r}: {command[:50]}", "PERMISSION")
+            # Note: rm -rf in chains still gets 3 options based on our testing
+            return ("bash_file_commands", 3)
 
         # Default Bash context
         return ("bash_file_commands", 3)
@@ -727,10 +831,8 @@ def get_exact_permission_options(tool_name, tool_input, permission_mode="default
         permission_mode: Permission mode from PreToolUse hook (default, acceptEdits, plan)
 
     Returns:
-        List of exact permission option strings
+        Tuple of exact permission option strings
     """
-    import os
-
     # Determine context and expected option count
     context_type, expected_options = determine_permission_context(tool_name, tool_input)
 
@@ -743,10 +845,7 @@ def get_exact_permission_options(tool_name, tool_input, permission_mode="default
     # For 2-option scenarios (background process, /tmp operations)
     if expected_options == 2:
         debug_log(f"Generating 2 options for {context_type}", "PERMISSION")
-        return [
-            "Yes",
-            "No, and tell Claude what to do differently (esc)"
-        ]
+        return _YES_DENY_2
 
     # Generate exact option 2 text based on context and extracted target
     option_2_text = None
@@ -785,21 +884,13 @@ def get_exact_permission_options(tool_name, tool_input, permission_mode="default
         option_2_text = "Yes, and don't ask again for similar Task operations"
         debug_log(f"Generated Task text", "PERMISSION")
 
-    # Build the full options list
+    # Build the full options tuple
     if option_2_text:
-        options = [
-            "Yes",
-            option_2_text,
-            "No, and tell Claude what to do differently (esc)"
-        ]
+        options = (_YES, option_2_text, _DENY_OPTION)
         debug_log(f"Generated EXACT text: {option_2_text[:50]}...", "PERMISSION")
     else:
         # Fallback if we couldn't generate specific text
-        options = [
-            "Yes",
-            "Yes, and don't ask again for this operation",
-            "No, and tell Claude what to do differently (esc)"
-        ]
+        options = _FALLBACK_OPTIONS_3
         debug_log(f"Using fallback for {tool_name} - couldn't extract target", "PERMISSION")
 
     return options
@@ -832,6 +923,69 @@ def extract_exact_permission_options(response, permission_mode="default"):
     return (tool_name, tool_input, exact_options)
 
 
+# Header for the numbered options in a permission prompt
+_REPLY_HEADER = "\n**Reply with:**\n"
+
+# Generic options when neither the buffer nor the transcript gave us any
+_FALLBACK_OPTIONS_TEXT = (
+    "**Reply with:**\n"
+    "1. Approve this time\n"
+    "2. Approve commands like this for this project\n"
+    "3. Deny, tell Claude what to do instead"
+)
+
+# Prefix for notification types that are passed through as-is
+_NOTIFICATION_EMOJI = {
+    "auth_success": "✅",
+    "elicitation_dialog": "❓",
+}
+_DEFAULT_NOTIFICATION_EMOJI = "🔔"
+
+
+def clear_output_buffer(buffer_file):
+    """Truncate the wrapper's output buffer so the next prompt starts clean."""
+    try:
+        os.truncate(buffer_file, 0)
+        debug_log("Output buffer cleared", "ENHANCE")
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        debug_log(f"Failed to clear buffer: {e}", "ENHANCE")
+
+
+def _format_bash_details(tool_input: dict) -> str:
+    """Command and purpose lines for a Bash permission prompt."""
+    parts = []
+    command = tool_input.get('command', '')
+    description = tool_input.get('description', '')
+    if command:
+        parts.append(f"**Command:** `{command}`\n")
+    if description:
+        parts.append(f"**Purpose:** {description}\n")
+    return "".join(parts)
+
+
+def _format_file_details(tool_input: dict) -> str:
+    """File line for a Write/Edit permission prompt."""
+    file_path = tool_input.get('file_path', '')
+    return f"**File:** `{file_path}`\n" if file_path else ""
+
+
+def _format_tool_params(tool_input: dict) -> str:
+    """For other tools, show first few input parameters."""
+    if not tool_input:
+        return ""
+    return f"**Parameters:** {str(tool_input)[:200]}\n"
+
+
+# Tool name -> formatter for the details section of a permission prompt
+_TOOL_FORMATTERS = {
+    "Bash": _format_bash_details,
+    "Write": _format_file_details,
+    "Edit": _format_file_details,
+}
+
+
 def enhance_notification_message(
     message: str,
     notification_type: str,
@@ -855,6 +1009,8 @@ def enhance_notification_message(
     try:
         # Import transcript parser
         from transcript_parser import TranscriptParser
+        from inotify_watch import IN_CLOSE_WRITE, IN_MODIFY, open_inotify_watch, wait_for_inotify
+        from config import OUTPUT_BUFFER_DIR
 
         # For permission prompts, extract tool details and add numbered options
         if notification_type == "permission_prompt" and os.path.exists(transcript_path):
@@ -862,37 +1018,77 @@ def enhance_notification_message(
 
             # FIRST: Try to get exact permission text from output buffer
             exact_options_from_buffer = None
-            buffer_file = f"/tmp/claude_output_{session_id}.txt"
-
-            if os.path.exists(buffer_file):
+            buffer_file = None
+            buffer_fd = None
+            # The wrapper exports its buffer path; otherwise look it up by
+            # session ID (wrappers started before the buffer moved to tmpfs
+            # still use /tmp)
+            buffer_candidates = [os.path.join(buffer_dir, f"claude_output_{session_id}.txt")
+                                 for buffer_dir in (OUTPUT_BUFFER_DIR, "/tmp")]
+            if os.environ.get("CLAUDE_OUTPUT_BUFFER"):
+                buffer_candidates.insert(0, os.environ["CLAUDE_OUTPUT_BUFFER"])
+            for buffer_file in buffer_candidates:
                 try:
-                    # RETRY LOOP: Buffer might not be ready yet, check multiple times
-                    # 10 attempts × 0.2s = 2 seconds max wait (unnoticeable to user)
-                    import time
-                    max_retries = 10
-                    retry_delay = 0.2  # 200ms between retries
-
-                    for attempt in range(max_retries):
-                        debug_log(f"Buffer read attempt {attempt + 1}/{max_retries}", "ENHANCE")
-
-                        with open(buffer_file, 'rb') as f:
-                            buffer_content = f.read()
-
-                        if buffer_content:
-                            debug_log(f"Read output buffer ({len(buffer_content)} bytes)", "ENHANCE")
-                            exact_options_from_buffer = parse_permission_prompt_from_output(buffer_content, session_id)
-
-                            if exact_options_from_buffer:
-                                debug_log(f"SUCCESS: Got exact options from buffer on attempt {attempt + 1}: {exact_options_from_buffer}", "ENHANCE")
-                                break  # Success! Exit retry loop
+                    buffer_fd = os.open(buffer_file, os.O_RDONLY)
+                    break
+                except FileNotFoundError:
+                    continue
+                except OSError as e:
+                    debug_log(f"Error opening buffer {buffer_file}: {e}", "ENHANCE")
+                    break
+
+            if buffer_fd is not None:
+                try:
+                    # RETRY LOOP: Buffer might not be ready yet. Re-read whenever
+                    # the wrapper appends to it (inotify), or else poll with
+                    # exponential backoff (50ms, 75ms, 112ms, ... capped at 400ms),
+                    # for at most 2 seconds (unnoticeable to user)
+                    max_wait = 2.0
+                    waited = 0.0
+                    attempt = 0
+                    start_time = time.time()
+                    # The wrapper appends to the file (compacting it now and
+                    # then, without replacing it), so one descriptor sees every
+                    # update; only the tail is read on each attempt
+                    watch_fd = open_inotify_watch(buffer_file, IN_MODIFY | IN_CLOSE_WRITE)
+
+                    try:
+                        while True:
+                            attempt += 1
+                            debug_log(f"Buffer read attempt {attempt} ({waited:.2f}s)", "ENHANCE")
+
+                            size = os.fstat(buffer_fd).st_size
+                            offset = max(size - OUTPUT_TAIL_BYTES, 0)
+                            buffer_content = os.pread(buffer_fd, size - offset, offset) if size else b''
+
+                            if buffer_content:
+                                if DEBUG:
+                                    debug_log(f"Read output buffer ({len(buffer_content)} bytes)", "ENHANCE")
+                                exact_options_from_buffer = parse_permission_prompt_from_output(buffer_content, session_id)
+
+                                if exact_options_from_buffer:
+                                    debug_log(f"SUCCESS: Got exact options from buffer on attempt {attempt}: {exact_options_from_buffer}", "ENHANCE")
+                                    break  # Success! Exit retry loop
+                                else:
+                                    debug_log(f"Buffer parsing failed on attempt {attempt}, retrying...", "ENHANCE")
                             else:
-                                debug_log(f"Buffer parsing failed on attempt {attempt + 1}, retrying...", "ENHANCE")
-                        else:
-                            debug_log(f"Buffer empty on attempt {attempt + 1}, retrying...", "ENHANCE")
+                                debug_log(f"Buffer empty on attempt {attempt}, retrying...", "ENHANCE")
 
-                        # Wait before next retry (unless this was the last attempt)
-                        if attempt < max_retries - 1:
-                            time.sleep(retry_delay)
+                            # Wait before next retry, unless that would exceed max_wait
+                            if watch_fd is not None:
+                                waited = time.time() - start_time
+                                if waited >= max_wait or not wait_for_inotify(watch_fd, max_wait - waited):
+                                    break
+                            else:
+                                retry_delay = min(0.05 * (1.5 ** (attempt - 1)), 0.4)
+                                if waited + retry_delay > max_wait:
+                                    break
+                                time.sleep(retry_delay)
+                                waited += retry_delay
+                    finally:
+                        os.close(buffer_fd)
+                        if watch_fd is not None:
+                            os.close(watch_fd)
 
                     if not exact_options_from_buffer:
                         debug_log("All buffer read attempts failed, falling back to hardcoded mapping", "ENHANCE")
@@ -900,11 +1096,13 @@ def enhance_notification_message(
                 except Exception as e:
                     debug_log(f"Error reading buffer: {e}", "ENHANCE")
 
-            # SECOND: Use retry loop to get tool details from transcript
+            # SECOND: Use retry loop to get tool details from transcript.
+            # With exact options already in hand the transcript only adds the
+            # tool header, so don't hold the prompt up waiting for it.
             debug_log("Parsing transcript for tool details", "ENHANCE")
             response = retry_parse_transcript(
                 transcript_path,
-                max_wait=2.5,  # 2.5 seconds is generous
+                max_wait=0.3 if exact_options_from_buffer else 2.5,
                 check_interval=0.1  # Check every 100ms
             )
 
@@ -917,35 +1115,16 @@ def enhance_notification_message(
                 debug_log(f"Successfully extracted: tool={tool_name}, has_input={bool(tool_input)}, has_options={bool(exact_options)}", "ENHANCE")
 
                 # Build detailed permission prompt
-                enhanced = f"⚠️ **Permission Required: {tool_name}**\n\n"
+                parts = [f"⚠️ **Permission Required: {tool_name}**\n\n"]
 
                 # Add tool-specific details
-                if tool_name == "Bash":
-                    command = tool_input.get('command', '')
-                    description = tool_input.get('description', '')
-                    if command:
-                        enhanced += f"**Command:** `{command}`\n"
-                    if description:
-                        enhanced += f"**Purpose:** {description}\n"
-                elif tool_name == "Write":
-                    file_path = tool_input.get('file_path', '')
-                    if file_path:
-                        enhanced += f"**File:** `{file_path}`\n"
-                elif tool_name == "Edit":
-                    file_path = tool_input.get('file_path', '')
-                    if file_path:
-                        enhanced += f"**File:** `{file_path}`\n"
-                else:
-                    # For other tools, show first few input parameters
-                    if tool_input:
-                        params_str = str(tool_input)[:200]
-                        enhanced += f"**Parameters:** {params_str}\n"
+                parts.append(_TOOL_FORMATTERS.get(tool_name, _format_tool_params)(tool_input))
 
                 # Add context snippet if available
                 if response.get('text'):
                     snippet = response['text'][:200].strip()
                     if snippet:
-                        enhanced += f"\n_Context: {snippet}..._\n"
+                        parts.append(f"\n_Context: {snippet}..._\n")
 
                 # Add numbered response options with EXACT Claude wording
                 # Priority: Buffer options > Hardcoded mapping > Fallback
@@ -955,29 +1134,29 @@ def enhance_notification_message(
                     if exact_options_from_buffer:
                         debug_log(f"Using EXACT options from OUTPUT BUFFER ({len(options_to_use)} options)", "ENHANCE")
                         # Clear buffer after successful extraction
-                        try:
-                            with open(buffer_file, 'wb') as f:
-                                pass  # Truncate file
-                            debug_log("Output buffer cleared", "ENHANCE")
-                        except Exception as e:
-                            debug_log(f"Failed to clear buffer: {e}", "ENHANCE")
+                        clear_output_buffer(buffer_file)
                     else:
                         debug_log(f"Using hardcoded mapping options ({len(options_to_use)} options)", "ENHANCE")
 
-                    enhanced += "\n**Reply with:**\n"
-                    for i, option in enumerate(options_to_use, 1):
-                        enhanced += f"{i}. {option}\n"
+                    parts.append(_REPLY_HEADER)
+                    parts.extend(f"{i}. {option}\n" for i, option in enumerate(options_to_use, 1))
                 else:
                     debug_log("WARNING: No exact options found - using fallback", "ENHANCE")
                     # This shouldn't happen since get_exact_permission_options has fallback
-                    enhanced += "\n**Reply with:**\n"
-                    enhanced += "1. Approve this time\n"
-                    enhanced += "2. Approve commands like this for this project\n"
-                    enhanced += "3. Deny, tell Claude what to do instead\n"
+                    parts.append(f"\n{_FALLBACK_OPTIONS_TEXT}\n")
+
+                enhanced = "".join(parts)
+            elif exact_options_from_buffer:
+                # No tool details, but the buffer gave us Claude's exact options
+                debug_log("Retry parse FAILED/TIMEOUT - using buffer options without tool details", "ENHANCE")
+                enhanced = f"⚠️ {message}\n{_REPLY_HEADER}" + "".join(
+                    f"{i}. {option}\n" for i, option in enumerate(exact_options_from_buffer, 1)
+                )
+                clear_output_buffer(buffer_file)
             else:
                 # Fallback if retry parsing timed out or failed
                 debug_log("Retry parse FAILED/TIMEOUT - using simple fallback", "ENHANCE")
-                enhanced = f"⚠️ {message}\n\n**Reply with:**\n1. Approve this time\n2. Approve commands like this for this project\n3. Deny, tell Claude what to do instead"
+                enhanced = f"⚠️ {message}\n\n{_FALLBACK_OPTIONS_TEXT}"
 
         # For idle prompts, include context about what Claude last said
         elif notification_type == "idle_prompt" and os.path.exists(transcript_path):
@@ -991,13 +1170,9 @@ def enhance_notification_message(
                     enhanced = f"⏰ {message}"
 
         # For other notification types, just add emoji
-        elif notification_type == "auth_success":
-            enhanced = f"✅ {message}"
-        elif notification_type == "elicitation_dialog":
-            enhanced = f"❓ {message}"
+        # (unknown type or no type gets the generic bell)
         else:
-            # Unknown type or no type - just pass through
-            enhanced = f"🔔 {message}"
+            enhanced = f"{_NOTIFICATION_EMOJI.get(notification_type, _DEFAULT_NOTIFICATION_EMOJI)} {message}"
 
     except Exception as e:
         # If enhancement fails, log it but return original message
@@ -1007,6 +1182,19 @@ def enhance_notification_message(
     return enhanced
 
 
+# WebClient cached per bot token (see _get_client)
+_slack_clients = {}
+
+
+def _get_client(bot_token: str):
+    """Return a WebClient for bot_token, creating it on first use."""
+    client = _slack_clients.get(bot_token)
+    if client is None:
+        from slack_sdk import WebClient
+        client = _slack_clients[bot_token] = WebClient(token=bot_token)
+    return client
+
+
 def post_to_slack(channel: str, thread_ts: str, text: str, bot_token: str, add_number_reactions: bool = False):
     """
     Post message to Slack thread, handling long messages.
@@ -1019,15 +1207,14 @@ def post_to_slack(channel: str, thread_ts: str, text: str, bot_token: str, add_n
         add_number_reactions: If True, add 1️⃣ 2️⃣ 3️⃣ reactions for quick responses
     """
     try:
-        from slack_sdk import WebClient
         from slack_sdk.errors import SlackApiError
+        client = _get_client(bot_token)
     except ImportError:
         log_error("slack_sdk not installed. Run: pip install slack-sdk")
         return False
 
-    client = WebClient(token=bot_token)
-
     # Split message if too long
+    from slack_text import split_message
     chunks = split_message(text)
 
     if len(chunks) > 5:
@@ -1069,10 +1256,12 @@ def post_to_slack(channel: str, thread_ts: str, text: str, bot_token: str, add_n
 
     # Add number emoji reactions for quick responses (on last message only)
     if add_number_reactions and last_message_ts:
-        import time
         debug_log("Adding number emoji reactions for quick response", "SLACK")
         number_emojis = ["one", "two", "three"]  # 1️⃣ 2️⃣ 3️⃣
 
+        # Slack shows reactions in arrival order, so add them one at a time.
+        # Each call has returned before the next is sent, which is all the
+        # ordering needs; no extra delay between them.
         for emoji in number_emojis:
             try:
                 client.reactions_add(
@@ -1081,7 +1270,6 @@ def post_to_slack(channel: str, thread_ts: str, text: str, bot_token: str, add_n
                     name=emoji
                 )
                 debug_log(f"Added reaction: {emoji}", "SLACK")
-                time.sleep(0.15)  # Small delay to ensure reactions appear in order
             except SlackApiError as e:
                 # Don't fail the whole operation if reactions fail
                 debug_log(f"Failed to add reaction {emoji}: {e.response.get('error', str(e))}", "SLACK")
@@ -1095,6 +1283,11 @@ def post_to_slack(channel: str, thread_ts: str, text: str, bot_token: str, add_n
     return True
 
 
+# Infers notification_type from the message when Claude doesn't send one.
+# "permission" anywhere wins over idle/waiting, hence the anchored lookahead.
+_NOTIF_TYPE_RE = re.compile(r'^(?=.*(?P<permission>permission))|idle|waiting', re.IGNORECASE | re.DOTALL)
+
+
 def main():
     """Main hook entry point"""
     debug_log("Entering main()", "LIFECYCLE")
@@ -1103,7 +1296,8 @@ def main():
         debug_log("Reading hook data from stdin...", "INPUT")
         try:
             hook_data = json.load(sys.stdin)
-            debug_log(f"Hook data received: {json.dumps(hook_data, indent=2)}", "INPUT")
+            if DEBUG:
+                debug_log(f"Hook data received: {json.dumps(hook_data, indent=2)}", "INPUT")
         except json.JSONDecodeError as e:
             log_error(f"Failed to parse hook input JSON: {e}")
             sys.exit(0)
@@ -1116,12 +1310,10 @@ def main():
 
         # Infer notification_type from message content if not provided
         if notification_type == "unknown" and notification_message:
-            if "permission" in notification_message.lower():
-                notification_type = "permission_prompt"
-                debug_log("Inferred notification_type as permission_prompt from message content", "INPUT")
-            elif "idle" in notification_message.lower() or "waiting" in notification_message.lower():
-                notification_type = "idle_prompt"
-                debug_log("Inferred notification_type as idle_prompt from message content", "INPUT")
+            match = _NOTIF_TYPE_RE.search(notification_message)
+            if match:
+                notification_type = "permission_prompt" if match.group("permission") is not None else "idle_prompt"
+                debug_log(f"Inferred notification_type as {notification_type} from message content", "INPUT")
 
         # Skip idle_prompt notifications - they're noisy and not useful for remote work
         if notification_type == "idle_prompt":
@@ -1164,6 +1356,7 @@ def main():
         debug_log("Opening registry database...", "REGISTRY")
         db = RegistryDatabase(db_path)
         debug_log(f"Querying session: {session_id}", "REGISTRY")
+
         session = db.get_session(session_id)
         debug_log(f"Session found: {session is not None}", "REGISTRY")
 
@@ -1171,10 +1364,8 @@ def main():
             log_error(f"Session {session_id[:8]} not found in registry")
             sys.exit(0)
 
-        # Check if Slack mirroring is enabled for this session
-        # Handle both string ('true'/'false') and boolean values
-        slack_enabled = session.get("slack_enabled", True)
-        if slack_enabled in ("false", False, "False", 0, "0"):
+        # Check if Slack mirroring is enabled for this session (a bool)
+        if not session["slack_enabled"]:
             log_info(f"Slack mirroring disabled for session {session_id[:8]}, skipping")
             debug_log("slack_enabled=false, skipping Slack post", "REGISTRY")
             sys.exit(0)
@@ -1202,17 +1393,15 @@ def main():
                     log_info(f"Found wrapper session {wrapper_session_id} with metadata, copying...")
                     debug_log(f"Wrapper has thread_ts={wrapper_session.get('thread_ts')}, channel={wrapper_session.get('channel')}", "REGISTRY")
 
-                    # Copy metadata to Claude session
+                    # Copy metadata to Claude session (no need to re-query,
+                    # we already hold the values we just wrote)
+                    slack_thread_ts = wrapper_session.get("thread_ts")
+                    slack_channel = wrapper_session.get("channel")
                     db.update_session(session_id, {
-                        'slack_thread_ts': wrapper_session.get("thread_ts"),
-                        'slack_channel': wrapper_session.get("channel")
+                        'slack_thread_ts': slack_thread_ts,
+                        'slack_channel': slack_channel
                     })
 
-                    # Re-query to get updated session
-                    session = db.get_session(session_id)
-                    slack_channel = session.get("channel")
-                    slack_thread_ts = session.get("thread_ts")
-
                     log_info(f"Self-healed: thread_ts={slack_thread_ts}, channel={slack_channel}")
                     debug_log("Self-healing successful", "REGISTRY")
                 else:
@@ -1245,7 +1434,8 @@ def main():
             transcript_path,
             session_id
         )
-        debug_log(f"Enhanced message (first 200 chars): {enhanced_message[:200]}", "SLACK")
+        if DEBUG:
+            debug_log(f"Enhanced message (first 200 chars): {enhanced_message[:200]}", "SLACK")
 
         # Post notification to Slack
         # Add number emoji reactions for permission prompts (enables quick tap responses)
@@ -1264,10 +1454,12 @@ def main():
         # Catch-all error handler
         log_error(f"Unexpected error in hook: {e}")
         debug_log(f"EXCEPTION: {e}", "ERROR")
-        import traceback
-        tb = traceback.format_exc()
-        debug_log(f"Traceback:\n{tb}", "ERROR")
-        traceback.print_exc(file=sys.stderr)
+        if DEBUG or sys.stderr.isatty():
+            # Format once, reuse for both the log and stderr
+            import traceback
+            tb = traceback.format_exc()
+            debug_log(f"Traceback:\n{tb}", "ERROR")
+            sys.stderr.write(tb)
 
     finally:
         # ALWAYS exit 0 (never block Claude)
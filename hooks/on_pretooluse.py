@@ -49,15 +49,25 @@ Architecture:
     6. Exit 0 (success or failure)
 
 Debug Logging:
+    - Enabled with CLAUDE_SLACK_DEBUG=1 (off by default)
     - All execution logged to /tmp/pretooluse_hook_debug.log
 """
 
+import atexit
 import sys
 import json
 import os
+import re
+import socket
 import time
-from pathlib import Path
-from datetime import datetime
+import zlib
+
+# orjson parses the hook input noticeably faster when it's installed;
+# its JSONDecodeError subclasses json.JSONDecodeError
+try:
+    from orjson import loads as _json_loads
+except ImportError:
+    _json_loads = json.loads
 
 # Hook version for auto-update detection
 HOOK_VERSION = "1.2.0"
@@ -70,41 +80,102 @@ STANDBY_MAX_AGE_SECONDS = 300  # 5 minutes - reset standby flag after this
 # Debug log file path
 DEBUG_LOG = "/tmp/pretooluse_hook_debug.log"
 
+# Debug logging is opt-in (CLAUDE_SLACK_DEBUG=1)
+DEBUG = os.environ.get("CLAUDE_SLACK_DEBUG", "0") == "1"
+
+# Results of the directory search, one file per working directory (named
+# by a CRC of the path), holding "<cwd>\n<claude-slack dir>". Hooks for a
+# session all run from the same project directory, so this saves repeating
+# the upward walk on every tool call, and sessions in different projects
+# keep separate entries. It lives under the user's own ~/.claude/slack (not
+# /tmp, where another user could plant one and have this hook import their
+# code).
+SLACK_DIR_CACHE_DIR = os.path.expanduser("~/.claude/slack")
+
+
+def _search_claude_slack_dir(start: str):
+    """Search upward from start for .claude/claude-slack (like git)."""
+    current = start
+    while True:
+        candidate = os.path.join(current, '.claude', 'claude-slack')
+        if os.path.exists(os.path.join(candidate, 'core')):
+            return candidate
+
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        current = parent
+
+
 # Find claude-slack directory dynamically
 def find_claude_slack_dir():
     """Find claude-slack directory using standard discovery patterns."""
-    import os
-
     # 1. Environment variable override (takes precedence)
     if 'CLAUDE_SLACK_DIR' in os.environ:
-        env_path = Path(os.environ['CLAUDE_SLACK_DIR'])
-        if (env_path / 'core').exists():
+        env_path = os.environ['CLAUDE_SLACK_DIR']
+        if os.path.exists(os.path.join(env_path, 'core')):
             return env_path
         else:
             print(f"[on_pretooluse.py] ERROR: CLAUDE_SLACK_DIR is set to '{env_path}' but no claude-slack installation found there.", file=sys.stderr)
             sys.exit(0)
 
-    # 2. Search upward from current directory (like git)
-    current = Path.cwd()
-    for parent in [current] + list(current.parents):
-        candidate = parent / '.claude' / 'claude-slack'
-        if (candidate / 'core').exists():
-            return candidate
+    # 2. Reuse the previous search from this directory if it's still valid
+    cwd = os.getcwd()
+    cache_path = os.path.join(SLACK_DIR_CACHE_DIR, f"claude_slack_dir_{zlib.crc32(os.fsencode(cwd)):08x}")
+    try:
+        with open(cache_path) as f:
+            cached_cwd, cached_dir = f.read().split('\n', 1)
+        if cached_cwd == cwd and os.path.isdir(os.path.join(cached_dir, 'core')):
+            return cached_dir
+    except (OSError, ValueError):
+        pass
 
-    # 3. Fall back to user home directory
-    fallback = Path.home() / '.claude' / 'claude-slack'
-    return fallback
+    # 3. Search upward from current directory, falling back to the user
+    # home directory
+    found = _search_claude_slack_dir(cwd) or os.path.join(os.path.expanduser('~'), '.claude', 'claude-slack')
+
+    # Write via rename so a concurrent hook never reads a half-written file
+    tmp_path = f"{cache_path}.{os.getpid()}"
+    try:
+        with open(tmp_path, 'w') as f:
+            f.write(f"{cwd}\n{found}")
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+    return found
 
 CLAUDE_SLACK_DIR = find_claude_slack_dir()
-CORE_DIR = CLAUDE_SLACK_DIR / "core"
+CORE_DIR = os.path.join(CLAUDE_SLACK_DIR, "core")
+
+
+# Open the debug log once per hook run; lines are buffered in memory and
+# written out together when the file is closed at exit
+_debug_fh = None
+if DEBUG:
+    try:
+        _debug_fh = open(DEBUG_LOG, "a", buffering=65536)
+        atexit.register(_debug_fh.close)
+    except OSError as e:
+        print(f"[on_pretooluse.py] DEBUG LOG FAILED: {e}", file=sys.stderr)
+
+
+def _timestamp():
+    """Local time as 'YYYY-MM-DD HH:MM:SS.mmm' for debug log lines"""
+    now = time.time()
+    ms = int((now - int(now)) * 1000)
+    return f"{time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(now))}.{ms:03d}"
 
 
 def debug_log(message: str, section: str = "GENERAL"):
-    """Log debug message to file with timestamp and section."""
+    """Log debug message to file with timestamp and section (no-op unless CLAUDE_SLACK_DEBUG=1)."""
+    if _debug_fh is None:
+        return
     try:
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-        with open(DEBUG_LOG, "a") as f:
-            f.write(f"[{timestamp}] [{section}] {message}\n")
+        _debug_fh.write(f"[{_timestamp()}] [{section}] {message}\n")
     except Exception as e:
         print(f"[on_pretooluse.py] DEBUG LOG FAILED: {e}", file=sys.stderr)
 
@@ -117,45 +188,50 @@ debug_log(f"Working directory: {os.getcwd()}", "INIT")
 
 # Ensure core directory exists before adding to path
 if os.path.isdir(CORE_DIR):
-    sys.path.insert(0, str(CORE_DIR))
+    sys.path.insert(0, CORE_DIR)
     debug_log(f"Added to sys.path: {CORE_DIR}", "INIT")
 else:
     msg = f"WARNING: claude-slack core directory not found at {CORE_DIR}"
     debug_log(msg, "ERROR")
     print(f"[on_pretooluse.py] {msg}", file=sys.stderr)
 
+# KEY=value lines in .env (comments and blank lines don't match)
+_ENV_RE = re.compile(r'^([^#=\s][^=]*)=(.*)$')
+
+
 # Load environment variables from .env file
 def load_env_file():
     """Load environment variables from claude-slack/.env"""
-    env_path = CLAUDE_SLACK_DIR / ".env"
+    env_path = os.path.join(CLAUDE_SLACK_DIR, ".env")
     debug_log(f"Looking for .env at: {env_path}", "ENV")
-    if env_path.exists():
-        debug_log(".env file found, loading...", "ENV")
-        loaded_count = 0
+    try:
         with open(env_path) as f:
-            for line in f:
-                line = line.strip()
-                if line and not line.startswith('#') and '=' in line:
-                    key, value = line.split('=', 1)
-                    if key not in os.environ:
-                        os.environ[key] = value
-                        loaded_count += 1
-        debug_log(f"Loaded {loaded_count} environment variables", "ENV")
-    else:
+            data = f.read()
+    except OSError:
         debug_log(".env file not found", "ENV")
+        return
+
+    # Only set keys not already in environment (first occurrence wins)
+    loaded = {}
+    for line in data.splitlines():
+        match = _ENV_RE.match(line.strip())
+        if match and match.group(1) not in os.environ:
+            loaded.setdefault(match.group(1), match.group(2))
+    os.environ.update(loaded)
+    debug_log(f"Loaded {len(loaded)} environment variables", "ENV")
 
 load_env_file()
 
 
-def log_error(message: str):
-    """Log error to stderr"""
-    debug_log(f"ERROR: {message}", "ERROR")
+def log_error(message: str, section: str = "ERROR"):
+    """Log error to stderr (and the debug log under the given section)"""
+    debug_log(f"ERROR: {message}", section)
     print(f"[on_pretooluse.py] ERROR: {message}", file=sys.stderr)
 
 
-def log_info(message: str):
-    """Log info to stderr"""
-    debug_log(message, "INFO")
+def log_info(message: str, section: str = "INFO"):
+    """Log info to stderr (and the debug log under the given section)"""
+    debug_log(message, section)
     print(f"[on_pretooluse.py] {message}", file=sys.stderr)
 
 
@@ -171,34 +247,23 @@ def format_question_for_slack(question: dict, index: int, total: int) -> str:
     Returns:
         Formatted markdown string
     """
-    lines = []
-
     # Question header
     if total > 1:
-        lines.append(f"**Question {index + 1}/{total}: {question.get('question', 'N/A')}**")
+        parts = [f"**Question {index + 1}/{total}: {question.get('question', 'N/A')}**\n"]
     else:
-        lines.append(f"**{question.get('question', 'N/A')}**")
-
-    lines.append("")
-
-    # Options
-    options = question.get('options', [])
-    multi_select = question.get('multiSelect', False)
-
-    if multi_select:
-        lines.append("_(Multiple selections allowed)_")
-        lines.append("")
+        parts = [f"**{question.get('question', 'N/A')}**\n"]
 
-    for i, option in enumerate(options, 1):
-        label = option.get('label', f'Option {i}')
-        description = option.get('description', '')
+    if question.get('multiSelect', False):
+        parts.append("\n_(Multiple selections allowed)_\n")
 
-        lines.append(f"{i}. **{label}**")
-        if description:
-            lines.append(f"   _{description}_")
-        lines.append("")
+    # Options, each preceded by a blank line
+    for i, option in enumerate(question.get('options', []), 1):
+        label = option['label'] if 'label' in option else f'Option {i}'
+        parts.append(f"\n{i}. **{label}**\n")
+        if description := option.get('description'):
+            parts.append(f"   _{description}_\n")
 
-    return "\n".join(lines)
+    return "".join(parts)
 
 
 def format_askuserquestion_for_slack(tool_input: dict) -> str:
@@ -229,47 +294,76 @@ def format_askuserquestion_for_slack(tool_input: dict) -> str:
     return "\n".join(lines)
 
 
-def split_message(text: str, max_length: int = 39000) -> list:
+def build_message_chunks(text: str) -> list:
     """
-    Split long message into chunks that fit in Slack's 40K char limit.
+    Split a message for Slack and add part indicators.
 
     Args:
-        text: Message text to split
-        max_length: Max chars per chunk (default: 39000, leaves room for part indicators)
+        text: Message text
 
     Returns:
-        List of text chunks
+        List of chunk texts, at most 5, ready to post in order
     """
-    if len(text) <= max_length:
-        return [text]
-
-    chunks = []
-    while text:
-        # Find a good breaking point (newline near max_length)
-        if len(text) <= max_length:
-            chunks.append(text)
-            break
+    from slack_text import split_message
+    chunks = split_message(text)
 
-        # Look for newline near the max length
-        break_point = text.rfind('\n', max_length - 500, max_length)
-        if break_point == -1:
-            # No newline found, just split at max_length
-            break_point = max_length
+    if len(chunks) > 5:
+        # Too many chunks, truncate
+        log_info(f"Message too long ({len(chunks)} chunks), truncating to 5 chunks")
+        chunks = chunks[:5]
 
-        chunks.append(text[:break_point])
-        text = text[break_point:].lstrip('\n')
+    # Add part indicator for multi-part messages
+    if len(chunks) > 1:
+        chunks = [f"{chunk}\n\n_(Part {i+1}/{len(chunks)})_" for i, chunk in enumerate(chunks)]
 
     return chunks
 
 
-def post_to_slack(channel: str, thread_ts: str, text: str, bot_token: str):
+def post_via_registry(session_id: str, chunks: list):
     """
-    Post message to Slack thread, handling long messages.
+    Hand a Slack post to the running registry service.
+
+    The registry already holds the database and a Slack client, so when it is
+    reachable this hook doesn't need to import or connect to either.
+
+    Args:
+        session_id: Session ID from hook data
+        chunks: Message chunks from build_message_chunks()
+
+    Returns:
+        The registry's response dict, or None if it couldn't be reached
+    """
+    try:
+        from config import get_socket_dir
+        registry_socket = os.path.join(get_socket_dir(), "registry.sock")
+
+        request = {"command": "POST_MESSAGE", "data": {"session_id": session_id, "chunks": chunks}}
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(2.0)
+            sock.connect(registry_socket)
+            sock.sendall((json.dumps(request) + "\n").encode('utf-8'))
+
+            data = b""
+            while not data.endswith(b"\n"):
+                chunk = sock.recv(4096)
+                if not chunk:
+                    break
+                data += chunk
+
+        return _json_loads(data)
+    except (ImportError, OSError, ValueError) as e:
+        debug_log(f"Registry service unavailable: {e}", "REGISTRY")
+        return None
+
+
+def post_to_slack(channel: str, thread_ts: str, chunks: list, bot_token: str):
+    """
+    Post message chunks to Slack thread.
 
     Args:
         channel: Slack channel ID
         thread_ts: Thread timestamp
-        text: Message text
+        chunks: Message chunks from build_message_chunks()
         bot_token: Slack bot token
     """
     try:
@@ -281,24 +375,11 @@ def post_to_slack(channel: str, thread_ts: str, text: str, bot_token: str):
 
     client = WebClient(token=bot_token)
 
-    # Split message if too long
-    chunks = split_message(text)
-
-    if len(chunks) > 5:
-        # Too many chunks, truncate
-        log_info(f"Message too long ({len(chunks)} chunks), truncating to 5 chunks")
-        chunks = chunks[:5]
-
-    # Post each chunk
+    # Post each chunk. Sequential on purpose: Slack orders thread replies by
+    # arrival, so concurrent posts could show "Part 2/3" before "Part 1/3"
     failed_chunks = []
-    for i, chunk in enumerate(chunks):
+    for i, message_text in enumerate(chunks):
         try:
-            # Add part indicator for multi-part messages
-            if len(chunks) > 1:
-                message_text = f"{chunk}\n\n_(Part {i+1}/{len(chunks)})_"
-            else:
-                message_text = chunk
-
             client.chat_postMessage(
                 channel=channel,
                 thread_ts=thread_ts,
@@ -328,6 +409,42 @@ def get_standby_flag_path(session_id: str) -> str:
     return os.path.join(STANDBY_FLAG_DIR, f"{STANDBY_FLAG_PREFIX}{session_id}.flag")
 
 
+def detach_from_hook() -> bool:
+    """
+    Double-fork so the rest of the hook runs in a background grandchild.
+
+    Claude waits for the hook process (and its stdout/stderr pipes) before
+    running the tool, so the Slack round trips are moved off that path.
+
+    Returns True in the detached grandchild, False if forking isn't possible
+    (the caller then just carries on in the foreground).
+    """
+    if not hasattr(os, "fork"):
+        return False
+
+    # Flush first so buffered output isn't written twice by the children
+    if _debug_fh is not None:
+        _debug_fh.flush()
+    sys.stderr.flush()
+
+    try:
+        if os.fork() != 0:
+            os._exit(0)
+        os.setsid()
+        if os.fork() != 0:
+            os._exit(0)
+    except OSError as e:
+        debug_log(f"Fork failed, posting in foreground: {e}", "SLACK")
+        return False
+
+    # Release the pipes Claude is reading from
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    os.close(devnull)
+    return True
+
+
 def try_claim_standby(session_id: str) -> bool:
     """
     Atomically check and claim the standby slot for this session.
@@ -340,29 +457,41 @@ def try_claim_standby(session_id: str) -> bool:
     """
     flag_path = get_standby_flag_path(session_id)
 
-    # Check if flag exists and is fresh
-    if os.path.exists(flag_path):
+    # Try to atomically create the flag file first - in the common case (flag
+    # already claimed this response) that single failed open is all it costs.
+    # O_CREAT | O_EXCL fails if file already exists
+    for attempt in range(2):
         try:
-            flag_age = time.time() - os.path.getmtime(flag_path)
-            if flag_age <= STANDBY_MAX_AGE_SECONDS:
-                return False  # Flag exists and is fresh, don't send
+            fd = os.open(flag_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            os.close(fd)
+            debug_log(f"Claimed standby slot for session {session_id[:8]}", "STANDBY")
+            return True
+        except FileExistsError:
+            pass
+        except Exception as e:
+            debug_log(f"Error claiming standby slot: {e}", "STANDBY")
+            return False
+
+        # Flag exists - only a stale one (older than STANDBY_MAX_AGE_SECONDS)
+        # is claimed again, by bumping its mtime in place
+        try:
+            flag_age = time.time() - os.stat(flag_path).st_mtime
+            if attempt == 0 and flag_age > STANDBY_MAX_AGE_SECONDS:
+                os.utime(flag_path, None)
+                debug_log(f"Reclaimed stale standby flag ({flag_age:.0f}s old)", "STANDBY")
+                return True
+        except FileNotFoundError:
+            # Removed in between (Stop hook) - try again
+            if attempt == 0:
+                continue
         except Exception:
             pass
 
-    # Try to atomically create the flag file
-    # O_CREAT | O_EXCL fails if file already exists
-    try:
-        fd = os.open(flag_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
-        os.close(fd)
-        debug_log(f"Claimed standby slot for session {session_id[:8]}", "STANDBY")
-        return True
-    except FileExistsError:
         # Another hook instance beat us to it
         debug_log(f"Standby slot already claimed for session {session_id[:8]}", "STANDBY")
         return False
-    except Exception as e:
-        debug_log(f"Error claiming standby slot: {e}", "STANDBY")
-        return False
+
+    return False
 
 
 def clear_standby_flag(session_id: str):
@@ -375,16 +504,40 @@ def clear_standby_flag(session_id: str):
         pass
 
 
+# Raw-stdin checks for the fast path in main(). Quotes inside JSON string
+# values are escaped, so these only match real keys.
+_ASKUSER_RE = re.compile(rb'"tool_name"\s*:\s*"AskUserQuestion"')
+_SESSION_ID_RE = re.compile(rb'"session_id"\s*:\s*"([^"\\]+)"')
+
+
 def main():
     """Main hook entry point"""
     debug_log("Entering main()", "LIFECYCLE")
     try:
         # Read hook data from stdin
         debug_log("Reading hook data from stdin...", "INPUT")
+        raw_input = sys.stdin.buffer.read()
+
+        # Fast path: most tool calls are neither AskUserQuestion nor the first
+        # of a response, so claim the standby slot straight from the raw bytes
+        # and exit without parsing the (possibly large) tool_input
+        claimed_standby = None
+        if not _ASKUSER_RE.search(raw_input):
+            session_ids = _SESSION_ID_RE.findall(raw_input)
+            if len(session_ids) == 1:
+                fast_session_id = session_ids[0].decode('utf-8', errors='replace')
+                if not try_claim_standby(fast_session_id):
+                    debug_log("Skipping tool (standby already sent)", "FILTER")
+                    sys.exit(0)
+                claimed_standby = fast_session_id
+
         try:
-            hook_data = json.load(sys.stdin)
-            debug_log(f"Hook data received: {json.dumps(hook_data, indent=2)}", "INPUT")
-        except json.JSONDecodeError as e:
+            hook_data = _json_loads(raw_input)
+            if DEBUG:
+                # Log the raw input as received - re-serializing it would be a
+                # second full pass over a possibly large tool_input
+                debug_log(f"Hook data received: {raw_input[:2048].decode('utf-8', errors='replace')}", "INPUT")
+        except (json.JSONDecodeError, UnicodeDecodeError) as e:
             log_error(f"Failed to parse hook input JSON: {e}")
             sys.exit(0)
 
@@ -403,7 +556,10 @@ def main():
         # Check if we should send a standby message (first tool call of response)
         # Uses atomic file creation to prevent race conditions
         is_askuser = tool_name == "AskUserQuestion"
-        send_standby = try_claim_standby(session_id) if not is_askuser else False
+        if is_askuser:
+            send_standby = False
+        else:
+            send_standby = claimed_standby == session_id or try_claim_standby(session_id)
 
         # Skip if neither standby nor AskUserQuestion
         if not send_standby and not is_askuser:
@@ -425,6 +581,19 @@ def main():
             debug_log("No message to send (shouldn't reach here)", "FILTER")
             sys.exit(0)
         debug_log(f"Formatted message (first 200 chars): {slack_message[:200]}", "FORMAT")
+        chunks = build_message_chunks(slack_message)
+
+        # Prefer handing the post to the registry service (it does the session
+        # lookup and posts in the background); fall back to posting directly
+        result = post_via_registry(session_id, chunks)
+        if result is not None:
+            if result.get("success"):
+                if result.get("skipped"):
+                    log_info(f"Registry skipped post for session {session_id[:8]}: {result['skipped']}")
+                else:
+                    log_info(f"Handed off to registry: {result.get('queued')} chunk(s) queued")
+                sys.exit(0)
+            debug_log(f"Registry could not post ({result.get('error')}), posting directly", "REGISTRY")
 
         # Query registry database for session metadata
         debug_log("Importing registry_db...", "REGISTRY")
@@ -456,8 +625,7 @@ def main():
         # Note: Database stores "true"/"false" as strings, not booleans
         slack_enabled = session.get("slack_enabled", "true")
         if slack_enabled == "false" or slack_enabled is False:
-            log_info(f"Slack mirroring disabled for session {session_id[:8]}, skipping")
-            debug_log("slack_enabled=false, skipping Slack post", "REGISTRY")
+            log_info(f"Slack mirroring disabled for session {session_id[:8]}, skipping", "REGISTRY")
             sys.exit(0)
 
         # Extract Slack metadata
@@ -508,25 +676,25 @@ def main():
 
         debug_log("Bot token found, posting to Slack...", "SLACK")
 
-        # Post question to Slack
-        success = post_to_slack(slack_channel, slack_thread_ts, slack_message, bot_token)
+        # Post question to Slack from a detached process - the hook itself
+        # returns to Claude right away
+        if detach_from_hook():
+            debug_log(f"Detached Slack post to pid {os.getpid()}", "SLACK")
+        success = post_to_slack(slack_channel, slack_thread_ts, chunks, bot_token)
 
         if success:
-            log_info("Successfully posted to Slack")
-            debug_log("Slack post successful", "SLACK")
+            log_info("Successfully posted to Slack", "SLACK")
             # Note: standby flag already created atomically in try_claim_standby()
         else:
-            log_info("Failed to post to Slack (see errors above)")
-            debug_log("Slack post failed", "SLACK")
+            log_info("Failed to post to Slack (see errors above)", "SLACK")
 
     except Exception as e:
         # Catch-all error handler
         log_error(f"Unexpected error in hook: {e}")
-        debug_log(f"EXCEPTION: {e}", "ERROR")
         import traceback
         tb = traceback.format_exc()
         debug_log(f"Traceback:\n{tb}", "ERROR")
-        traceback.print_exc(file=sys.stderr)
+        sys.stderr.write(tb)
 
     finally:
         # ALWAYS exit 0 (never block Claude)